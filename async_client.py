@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+API_PREFIX = 'https://api.spotify.com/v1/'
+
+
+class AsyncSpotify:
+    # asyncio counterpart of the spotipy.Spotify calls the scan uses (search,
+    # playlist, user). Every request goes over one pooled keep-alive session
+    # with at most max_concurrency connections open at once. Errors are raised
+    # as SpotifyException so callers handle both backends the same way.
+    # With metrics (a metrics.ScanMetrics), every request's latency is
+    # recorded under the stage of its call ('search', 'playlist', 'owner'),
+    # without the time it waited for the rate limiter or a free connection.
+    def __init__(self, auth_manager, max_concurrency=50, limiter=None, requests_timeout=10, prefix=API_PREFIX,
+                 response_cache=None, metrics=None):
+        self.auth_manager = auth_manager
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.requests_timeout = requests_timeout
+        self.prefix = prefix
+        self._session = None
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = None
+
+    async def __aenter__(self):
+        # Imported here so importing this module (e.g. for API_PREFIX) stays cheap
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        # Tells _request how long it queued for a free connection
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_queued_start.append(_connection_queued)
+        trace.on_connection_queued_end.append(_connection_dequeued)
+        # Like requests' timeout: per connect and read, not counting the time
+        # a request queues for a free connection
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.requests_timeout,
+                                        sock_read=self.requests_timeout)
+        self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace], timeout=timeout)
+        self._token_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def _access_token(self, refresh=False):
+        async with self._token_lock:
+            if refresh or self._token is None or time.time() >= self._token_expires_at:
+                # spotipy's auth managers are blocking (and may read the token cache from disk)
+                self._token = await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+                cached = self.auth_manager.cache_handler.get_cached_token() or {}
+                self._token_expires_at = cached.get('expires_at', time.time() + 300) - 60
+            return self._token
+
+    async def _request(self, path, params, stage=None):
+        # Timed without the wait for a free connection; the rate limiter was
+        # already waited for by the caller
+        started = time.perf_counter()
+        wait = {'seconds': 0.0}
+        try:
+            return await self._exchange(path, params, wait)
+        finally:
+            if self.metrics is not None and stage is not None:
+                self.metrics.record(stage, time.perf_counter() - started - wait['seconds'])
+
+    async def _exchange(self, path, params, wait):
+        url = self.prefix + path
+        key = cached = None
+        if self.response_cache is not None:
+            from http_cache import cache_key
+            key = cache_key('GET', url, params)
+            cached = self.response_cache.get(key)
+            if cached is not None and cached[3]:
+                self.response_cache.hits += 1
+                return json.loads(cached[2])
+        token = await self._access_token()
+        for attempt in range(2):
+            headers = {'Authorization': f'Bearer {token}'}
+            if cached is not None and cached[0]:
+                headers['If-None-Match'] = cached[0]
+            async with self._session.get(url, params=params, headers=headers,
+                                         trace_request_ctx=wait) as response:
+                if response.status == 401 and attempt == 0:
+                    token = await self._access_token(refresh=True)
+                    continue
+                if response.status == 304 and cached is not None:
+                    self.response_cache.revalidated += 1
+                    self.response_cache.refresh(key, response.headers)
+                    return json.loads(cached[2])
+                if response.status >= 400:
+                    import aiohttp
+                    from spotipy.exceptions import SpotifyException
+                    try:
+                        msg = (await response.json()).get('error', {}).get('message')
+                    except (aiohttp.ContentTypeError, ValueError):
+                        msg = await response.text() or None
+                    raise SpotifyException(response.status, -1, f"{response.url}:\n {msg}",
+                                           headers=response.headers)
+                body = await response.read()
+                if key is not None:
+                    self.response_cache.misses += 1
+                    if response.status == 200:
+                        self.response_cache.put(key, response.headers, body)
+                return json.loads(body)
+
+    async def _get(self, path, stage, **params):
+        params = {key: value for key, value in params.items() if value is not None}
+        if self.limiter is not None:
+            return await self.limiter.call_async(self._request, path, params, stage)
+        return await self._request(path, params, stage)
+
+    async def search(self, q, limit=10, offset=0, type='track', market=None):
+        return await self._get('search', 'search', q=q, limit=limit, offset=offset, type=type, market=market)
+
+    async def playlist(self, playlist_id, fields=None, market=None, additional_types=('track',)):
+        # Same query parameters as spotipy so both backends share cache entries
+        return await self._get(f'playlists/{playlist_id}', 'playlist', fields=fields, market=market,
+                               additional_types=','.join(additional_types))
+
+    async def user(self, user):
+        return await self._get(f'users/{user}', 'owner')
+
+
+async def _connection_queued(session, context, params):
+    context.trace_request_ctx['queued'] = time.perf_counter()
+
+
+async def _connection_dequeued(session, context, params):
+    wait = context.trace_request_ctx
+    wait['seconds'] += time.perf_counter() - wait.pop('queued')
@@ -0,0 +1,109 @@
+import threading
+import time
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
+
+# Tokens are renewed this many seconds before they expire
+REFRESH_MARGIN = 300
+
+# Wait before retrying a failed background refresh
+REFRESH_RETRY = 10
+
+
+class TokenRefresher:
+    # Wraps a spotipy auth manager and renews its token from a background
+    # thread shortly before it expires. API calls are handed the token kept
+    # in memory, so they never wait for a refresh (or read the token cache
+    # file); only the very first token of a fresh cache is fetched inline.
+    # The token is still persisted through the wrapped manager's cache
+    # handler, so the next run starts from it without any auth round trip.
+    def __init__(self, auth_manager, margin=REFRESH_MARGIN):
+        self.auth_manager = auth_manager
+        self.margin = margin
+        # Read by AsyncSpotify for the expiry time
+        self.cache_handler = self
+        self.refreshes = 0
+        self._token = auth_manager.cache_handler.get_cached_token()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __getattr__(self, name):
+        return getattr(self.auth_manager, name)
+
+    def start(self):
+        # A missing or stale cached token is fetched right away, in the background
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def get_cached_token(self):
+        return self._token
+
+    def get_access_token(self, as_dict=False, **kwargs):
+        token = self._token
+        if token is None or token['expires_at'] <= time.time() + 60:
+            token = self.refresh(token)
+        return token if as_dict else token['access_token']
+
+    def refresh(self, stale=None):
+        with self._lock:
+            # Someone else may have refreshed it while we waited
+            if self._token is not stale:
+                return self._token
+            if stale is not None and stale.get('refresh_token') and isinstance(self.auth_manager, SpotifyOAuth):
+                token = self.auth_manager.refresh_access_token(stale['refresh_token'])
+            else:
+                if isinstance(self.auth_manager, SpotifyClientCredentials):
+                    access_token = self.auth_manager.get_access_token(as_dict=False, check_cache=False)
+                else:
+                    # Interactive sign-in (or whatever a custom manager does)
+                    access_token = self.auth_manager.get_access_token(as_dict=False)
+                # Spotify tokens last an hour; assumed if the cache couldn't be written
+                token = self.auth_manager.cache_handler.get_cached_token() or \
+                    {'access_token': access_token, 'expires_at': int(time.time()) + 3600}
+            self._token = token
+            self.refreshes += 1
+            return token
+
+    def _run(self):
+        while not self._stopped.is_set():
+            token = self._token
+            wait = token['expires_at'] - self.margin - time.time() if token is not None else 0
+            if wait > 0:
+                self._stopped.wait(wait)
+                continue
+            try:
+                self.refresh(token)
+            except Exception:
+                # Calls fall back to refreshing inline once the token expires
+                self._stopped.wait(REFRESH_RETRY)
+
+
+def auth_managers(creds, user_auth=True, scope="playlist-read-private"):
+    # credentials.json holds one app's client_id, client_secret and
+    # redirect_uri, or a list of them. user_auth=False uses the client
+    # credentials flow instead: no browser sign-in, and enough for the public
+    # search, playlist and user lookups a scan makes. Every app caches its
+    # tokens in its own file so several apps never pick up each other's
+    # tokens; a single app with user sign-in keeps spotipy's default cache.
+    if isinstance(creds, dict):
+        creds = [creds]
+    managers = []
+    for app in creds:
+        if user_auth:
+            cache_handler = CacheFileHandler(cache_path=f".cache-{app['client_id']}") if len(creds) > 1 else None
+            manager = SpotifyOAuth(client_id=app['client_id'],
+                                   client_secret=app['client_secret'],
+                                   redirect_uri=app['redirect_uri'],
+                                   scope=scope,
+                                   cache_handler=cache_handler)
+        else:
+            manager = SpotifyClientCredentials(client_id=app['client_id'],
+                                               client_secret=app['client_secret'],
+                                               cache_handler=CacheFileHandler(
+                                                   cache_path=f".cache-app-{app['client_id']}"))
+        managers.append(TokenRefresher(manager).start())
+    return managers
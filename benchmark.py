@@ -0,0 +1,138 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from cache import TTLCache
+from metrics import ScanMetrics, TimedClient
+from mock_spotify import MockSpotifyServer, StaticTokenAuth
+from ratelimit import RateLimiter
+from scan_engine import ScanEngine
+
+# Genre names searched on the mock server
+GENRES = ['house', 'techno', 'drum and bass', 'trance', 'dubstep', 'edm', 'electro', 'synthwave']
+
+STAGES = ['search', 'playlist', 'owner']
+
+TARGETS = ['engine-threads', 'engine-asyncio', 'engine-lazy', 'api-threads', 'api-asyncio']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the scan pipelines against a local mock Spotify API.')
+    parser.add_argument('--targets', default=','.join(TARGETS),
+                        help=f"comma-separated pipelines to run (default: all of {', '.join(TARGETS)})")
+    parser.add_argument('--genres', type=int, default=2, help=f'genres to scan (up to {len(GENRES)})')
+    parser.add_argument('--playlists', type=int, default=500, help='search results per genre')
+    parser.add_argument('--owners', type=int, default=100, help='distinct playlist owners')
+    parser.add_argument('--overlap', type=float, default=0.1, help='fraction of playlists every genre shares')
+    parser.add_argument('--latency', type=float, default=20, help='server latency per request in ms')
+    parser.add_argument('--jitter', type=float, default=5, help='extra random latency per request, up to this many ms')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='answer every Nth request with 429 (0: never)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with a 429')
+    parser.add_argument('--payload-bytes', type=int, default=200, help='size of every playlist description')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent playlist/owner lookups')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per target')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't trace allocations (tracing slows the pipelines down a little)")
+    parser.add_argument('-o', '--output', default=None,
+                        help='append every run as a JSON line to this file, to track results over time')
+    return parser.parse_args(argv)
+
+
+def run_engine(prefix, genres, args, metrics, backend='threads', lazy=False):
+    results = []
+    engine = ScanEngine(genres, max_workers=args.workers, backend=backend, lazy=lazy, owner_cache=TTLCache(),
+                        api_prefix=prefix, limiter=RateLimiter(), metrics=metrics,
+                        on_results=lambda batch: results.append(len(batch)))
+    engine.run(StaticTokenAuth())
+    return sum(results)
+
+
+def run_api(prefix, genres, args, metrics, backend='threads'):
+    # search_playlists_by_genre only scans the first search page of every genre
+    import spotifyapi
+    sp = spotifyapi.sp
+    sp.prefix = prefix
+    sp.auth_manager = StaticTokenAuth()
+    # The asyncio variant builds its own client, so its stages aren't timed
+    spotifyapi.sp = TimedClient(sp, metrics)
+    try:
+        return len(spotifyapi.search_playlists_by_genre(genres, backend=backend))
+    finally:
+        spotifyapi.sp = sp
+
+
+def run_target(target, prefix, genres, args):
+    metrics = ScanMetrics()
+    if target.startswith('api-'):
+        # Imported (spotipy and all) before the clock starts
+        import spotifyapi  # noqa: F401
+    if not args.no_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if target.startswith('engine-'):
+        backend = 'asyncio' if target == 'engine-asyncio' else 'threads'
+        playlists = run_engine(prefix, genres, args, metrics, backend=backend, lazy=target == 'engine-lazy')
+    else:
+        playlists = run_api(prefix, genres, args, metrics, backend=target.split('-', 1)[1])
+    seconds = time.perf_counter() - started
+    peak = None
+    if not args.no_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    run = {
+        'target': target,
+        'playlists': playlists,
+        'seconds': round(seconds, 3),
+        'playlists_per_sec': round(playlists / seconds, 1) if seconds else None,
+        'peak_memory_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+    }
+    for stage in STAGES:
+        for q in (50, 99):
+            value = metrics.percentile(stage, q)
+            run[f'{stage}_p{q}_ms'] = round(value * 1000, 1) if value is not None else None
+    return run
+
+
+def print_table(runs):
+    columns = ['target', 'playlists', 'seconds', 'playlists_per_sec'] + \
+              [f'{stage}_p{q}_ms' for stage in STAGES for q in (50, 99)] + ['peak_memory_mb']
+    rows = [[str(run[column]) if run[column] is not None else '-' for column in columns] for run in runs]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    targets = args.targets.split(',')
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        sys.exit(f"Unknown targets: {', '.join(sorted(unknown))}")
+    genres = GENRES[:args.genres]
+
+    config = {key: value for key, value in vars(args).items() if key not in ('targets', 'output')}
+    runs = []
+    for target in targets:
+        for _ in range(args.repeat):
+            # A fresh server per run, so 429 injection starts from the same point
+            with MockSpotifyServer(playlists=args.playlists, owners=args.owners, latency=args.latency / 1000,
+                                   jitter=args.jitter / 1000, rate_limit_every=args.rate_limit_every,
+                                   retry_after=args.retry_after, payload_bytes=args.payload_bytes,
+                                   overlap=args.overlap) as server:
+                run = run_target(target, server.prefix, genres, args)
+                run['requests'] = dict(server.requests)
+                run['rate_limited'] = server.rate_limited
+            runs.append(run)
+            print(f"{target}: {run['playlists']} playlists in {run['seconds']}s", file=sys.stderr)
+
+    print_table(runs)
+    if args.output:
+        with open(args.output, 'a') as file:
+            for run in runs:
+                file.write(json.dumps({'time': time.time(), 'config': config, **run}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
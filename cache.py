@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    # Thread-safe LRU cache whose entries expire after ttl seconds. When a path
+    # is given the entries can be saved and loaded again on the next run.
+    def __init__(self, maxsize=10000, ttl=24 * 3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._pending = {}
+        self._pending_async = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.time() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(key, value, time.time())
+
+    def _put(self, key, value, stored_at):
+        self._data[key] = (stored_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        # Concurrent callers asking for the same missing key wait for a
+        # single loader call instead of each hitting the API
+        while True:
+            with self._lock:
+                value = self._get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                event = self._pending.get(key)
+                if event is None:
+                    self.misses += 1
+                    event = self._pending[key] = threading.Event()
+                    break
+            event.wait()
+            with self._lock:
+                value = self._get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+        try:
+            value = loader(key)
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+    async def get_or_load_async(self, key, loader):
+        # Same as get_or_load for coroutines running on one event loop
+        while True:
+            with self._lock:
+                value = self._get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                future = self._pending_async.get(key)
+                if future is None:
+                    self.misses += 1
+                    future = self._pending_async[key] = asyncio.get_running_loop().create_future()
+                    break
+            value = await future
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return value
+        value = None
+        try:
+            value = await loader(key)
+            self.put(key, value)
+            return value
+        finally:
+            del self._pending_async[key]
+            future.set_result(value)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, stored_at, value in entries:
+                if now - stored_at <= self.ttl:
+                    self._put(key, value, stored_at)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, stored_at, value] for key, (stored_at, value) in self._data.items()]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(entries, file)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import time
+
+
+class ScanCheckpoint:
+    # Progress of a scan kept in a small JSON state file: which search pages
+    # (genre, offset) are fully done and which playlist IDs were already
+    # enriched, so a stopped scan can resume without re-fetching them.
+    def __init__(self, path='scan_state.json', interval=5.0):
+        self.path = path
+        self.interval = interval
+        self.genres = []
+        self.pages = {}
+        self.processed = set()
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return False
+        self.genres = state['genres']
+        self.pages = {genre: set(offsets) for genre, offsets in state['pages'].items()}
+        self.processed = set(state['processed'])
+        return True
+
+    def can_resume(self, genres):
+        return self.load() and self.genres == list(genres) and bool(self.processed or self.pages)
+
+    def start(self, genres, resume=False):
+        if not (resume and self.can_resume(genres)):
+            self.genres = list(genres)
+            self.pages = {}
+            self.processed = set()
+
+    def page_done(self, genre, offset):
+        return offset in self.pages.get(genre, ())
+
+    def mark_processed(self, playlist_id):
+        with self._lock:
+            self.processed.add(playlist_id)
+
+    def mark_page(self, genre, offset):
+        with self._lock:
+            self.pages.setdefault(genre, set()).add(offset)
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            state = {
+                'genres': self.genres,
+                'pages': {genre: sorted(offsets) for genre, offsets in self.pages.items()},
+                'processed': sorted(self.processed),
+            }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+    def clear(self):
+        self.pages = {}
+        self.processed = set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
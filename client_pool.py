@@ -0,0 +1,88 @@
+import functools
+import inspect
+import threading
+
+
+class ClientPool:
+    # Spreads API calls over several clients, one per registered Spotify app,
+    # each with its own token and rate limiter. Every call goes to the client
+    # that isn't waiting out a 429, has the fewest calls in flight and has
+    # been throttled least, so a scan gets the combined rate limit of all
+    # apps. The clients (spotipy or AsyncSpotify) are passed in without
+    # limiters of their own: the pool applies each app's limiter and moves
+    # a call that hit a 429 on to another app.
+    def __init__(self, clients, limiters):
+        self.clients = list(clients)
+        self.limiters = list(limiters)
+        self.calls = [0] * len(self.clients)
+        self._in_flight = [0] * len(self.clients)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.clients)
+
+    @property
+    def throttled(self):
+        return sum(limiter.throttled for limiter in self.limiters)
+
+    def _load(self, index):
+        limiter = self.limiters[index]
+        # Free apps first; when all are waiting out a 429, the one done soonest
+        return limiter.blocked_for(), self._in_flight[index], limiter.throttled
+
+    def _acquire(self):
+        with self._lock:
+            index = min(range(len(self.clients)), key=self._load)
+            self._in_flight[index] += 1
+            self.calls[index] += 1
+            return index
+
+    def _release(self, index):
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    def call(self, name, *args, **kwargs):
+        # A 429 backs off only the app that got it; the retry goes to
+        # whichever app is the least loaded by then
+        attempt = 0
+        while True:
+            index = self._acquire()
+            limiter = self.limiters[index]
+            try:
+                limiter.acquire()
+                result = getattr(self.clients[index], name)(*args, **kwargs)
+            except Exception as e:
+                if not limiter.should_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            finally:
+                self._release(index)
+            limiter.recover()
+            return result
+
+    async def call_async(self, name, *args, **kwargs):
+        attempt = 0
+        while True:
+            index = self._acquire()
+            limiter = self.limiters[index]
+            try:
+                await limiter.acquire_async()
+                result = await getattr(self.clients[index], name)(*args, **kwargs)
+            except Exception as e:
+                if not limiter.should_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            finally:
+                self._release(index)
+            limiter.recover()
+            return result
+
+    def __getattr__(self, name):
+        attr = getattr(self.clients[0], name)
+        if not callable(attr):
+            return attr
+        if inspect.iscoroutinefunction(attr):
+            return functools.partial(self.call_async, name)
+        return functools.partial(self.call, name)
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import threading
+
+
+def load_cipher(key_path='cipher_key.key'):
+    # The key is generated once and kept: a new key per run would make
+    # anything encrypted with the previous one unreadable
+    from cryptography.fernet import Fernet
+    try:
+        with open(key_path, 'rb') as key_file:
+            return Fernet(key_file.read().strip())
+    except FileNotFoundError:
+        key = Fernet.generate_key()
+        with open(key_path, 'wb') as key_file:
+            key_file.write(key)
+        return Fernet(key)
+
+
+class CredentialsService:
+    # Reads the credentials file on first use, as plain JSON or encrypted
+    # with the key in key_path, and keeps the auth managers built from it.
+    # Every search then starts from the same managers, with their tokens
+    # already fetched and kept fresh in the background. The file is only
+    # read again after it changes, and cryptography and spotipy are only
+    # imported once they are needed.
+    def __init__(self, path='credentials.json', key_path='cipher_key.key'):
+        self.path = path
+        self.key_path = key_path
+        self._cipher = None
+        self._creds = None
+        self._mtime = None
+        # user_auth -> auth managers
+        self._managers = {}
+        self._lock = threading.RLock()
+
+    def cipher(self):
+        if self._cipher is None:
+            self._cipher = load_cipher(self.key_path)
+        return self._cipher
+
+    def credentials(self):
+        # Raises FileNotFoundError without a credentials file and ValueError
+        # for one that can't be read
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self._mtime:
+                with open(self.path, 'rb') as file:
+                    data = file.read()
+                try:
+                    creds = json.loads(data)
+                except ValueError:
+                    creds = json.loads(self.decrypt(data))
+                self.close()
+                self._creds = creds
+                self._mtime = mtime
+            return self._creds
+
+    def decrypt(self, data):
+        from cryptography.fernet import InvalidToken
+        try:
+            return self.cipher().decrypt(data.strip())
+        except InvalidToken:
+            raise ValueError(f'{self.path} is neither JSON nor encrypted with {self.key_path}')
+
+    def auth_managers(self, user_auth=True):
+        from auth import auth_managers
+        with self._lock:
+            creds = self.credentials()
+            if user_auth not in self._managers:
+                self._managers[user_auth] = auth_managers(creds, user_auth=user_auth)
+            return self._managers[user_auth]
+
+    def encrypt(self):
+        # Rewrites the credentials file encrypted with the kept key
+        with self._lock:
+            data = json.dumps(self.credentials(), indent=4).encode()
+            with open(self.path, 'wb') as file:
+                file.write(self.cipher().encrypt(data))
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def close(self):
+        # Stops the background token refreshes
+        with self._lock:
+            for managers in self._managers.values():
+                for manager in managers:
+                    manager.stop()
+            self._managers = {}
+
+
+if __name__ == '__main__':
+    # python credentials.py [credentials.json]: encrypts the file in place
+    CredentialsService(*sys.argv[1:2]).encrypt()
@@ -0,0 +1,75 @@
+import hashlib
+import threading
+from array import array
+
+
+def fingerprint(playlist_id):
+    # 64-bit hash of the ID; 0 is reserved for empty table slots
+    return int.from_bytes(hashlib.blake2b(playlist_id.encode(), digest_size=8).digest(), 'little') or 1
+
+
+class SeenIds:
+    # Set of playlist IDs kept as 64-bit fingerprints in an open-addressing
+    # table, plus a bitmask of the genres (by index) each ID was found under.
+    # That is 16 bytes per slot instead of the ~100 bytes a set of str costs,
+    # and collisions are negligible below billions of IDs. Genre indexes past
+    # the 64 the bitmask holds are kept in a plain dict instead.
+    def __init__(self, capacity=4096):
+        # capacity has to be a power of two
+        self._keys = array('Q', bytes(8 * capacity))
+        self._genres = array('Q', bytes(8 * capacity))
+        # fingerprint -> genre indexes from 64 on
+        self._more_genres = {}
+        self._count = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, playlist_id):
+        with self._lock:
+            return self._keys[self._slot(fingerprint(playlist_id))] != 0
+
+    def _slot(self, key):
+        mask = len(self._keys) - 1
+        slot = key & mask
+        while self._keys[slot] not in (0, key):
+            slot = (slot + 1) & mask
+        return slot
+
+    def add(self, playlist_id, genre_index=0):
+        # True the first time an ID is seen
+        key = fingerprint(playlist_id)
+        with self._lock:
+            slot = self._slot(key)
+            if genre_index < 64:
+                self._genres[slot] |= 1 << genre_index
+            else:
+                self._more_genres.setdefault(key, set()).add(genre_index)
+            if self._keys[slot]:
+                self.duplicates += 1
+                return False
+            self._keys[slot] = key
+            self._count += 1
+            if self._count * 2 > len(self._keys):
+                self._grow()
+            return True
+
+    def genres(self, playlist_id):
+        # Indexes of the genres the ID was found under
+        key = fingerprint(playlist_id)
+        with self._lock:
+            mask = self._genres[self._slot(key)]
+            more = sorted(self._more_genres.get(key, ()))
+        return [index for index in range(64) if mask >> index & 1] + more
+
+    def _grow(self):
+        keys, genres = self._keys, self._genres
+        self._keys = array('Q', bytes(16 * len(keys)))
+        self._genres = array('Q', bytes(16 * len(keys)))
+        for key, mask in zip(keys, genres):
+            if key:
+                slot = self._slot(key)
+                self._keys[slot] = key
+                self._genres[slot] = mask
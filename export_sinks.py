@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+import sys
+
+NUMERIC_KEYS = {'likes', 'followers', 'tracks'}
+
+
+class JsonLinesSink:
+    def __init__(self, path, columns, append=False):
+        self.columns = columns
+        self._file = sys.stdout if path == '-' else open(path, 'a' if append else 'w')
+
+    def write(self, results):
+        for result in results:
+            self._file.write(json.dumps({key: result[key] for key in self.columns}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class CsvSink:
+    def __init__(self, path, columns, append=False):
+        self.columns = columns
+        self._file = sys.stdout if path == '-' else open(path, 'a' if append else 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+        if self._file is sys.stdout or self._file.tell() == 0:
+            self._writer.writeheader()
+
+    def write(self, results):
+        self._writer.writerows(results)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetSink:
+    # Rows are buffered column-wise and written out as one row group every
+    # row_group_size results, so memory stays bounded by the row group
+    def __init__(self, path, columns, row_group_size=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError('Parquet export needs pyarrow: pip install pyarrow')
+        if path == '-':
+            raise ValueError('Parquet output has to go to a file')
+        self._pa = pyarrow
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self._schema = pyarrow.schema([(key, pyarrow.int64() if key in NUMERIC_KEYS else pyarrow.string())
+                                       for key in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._buffer = {key: [] for key in columns}
+        self._buffered = 0
+
+    def write(self, results):
+        for result in results:
+            for key in self.columns:
+                self._buffer[key].append(result[key])
+        self._buffered += len(results)
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffered:
+            table = self._pa.Table.from_pydict(self._buffer, schema=self._schema)
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+            self._buffer = {key: [] for key in self.columns}
+            self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+SINKS = {
+    'jsonl': JsonLinesSink,
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+}
+
+
+def open_sink(path, columns, format=None, append=False):
+    # The format defaults to the file extension, and JSON Lines for stdout.
+    # Parquet files can't be appended to, so a resumed scan writes a new
+    # numbered part next to the original file instead.
+    if format is None:
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        format = extension if extension in SINKS else 'jsonl'
+    if format == 'parquet':
+        if append:
+            stem, extension = os.path.splitext(path)
+            part = 1
+            while os.path.exists(f"{stem}.{part}{extension}"):
+                part += 1
+            path = f"{stem}.{part}{extension}"
+        return ParquetSink(path, columns)
+    return SINKS[format](path, columns, append=append)
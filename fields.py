@@ -0,0 +1,32 @@
+# Builds the `fields` filter for GET /playlists/{id} so only the attributes a
+# result actually uses are downloaded (no tracks page, images, etc.)
+
+# Result key -> dotted paths in the playlist object it is built from
+PLAYLIST_PATHS = {
+    'id': ['id'],
+    'name': ['name'],
+    'likes': ['followers.total'],
+    'followers': ['followers.total'],
+    'owner': ['owner.display_name'],
+    'link': ['external_urls.spotify'],
+    'owner_email': ['owner.id'],
+    'additional_info': ['description'],
+    'tracks': ['tracks.total'],
+}
+
+
+def _render(tree):
+    parts = []
+    for name, children in tree.items():
+        parts.append(f"{name}({_render(children)})" if children else name)
+    return ','.join(parts)
+
+
+def playlist_fields(keys, extra=()):
+    paths = [path for key in keys for path in PLAYLIST_PATHS.get(key, [])] + list(extra)
+    tree = {}
+    for path in paths:
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return _render(tree)
@@ -0,0 +1,140 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+def cache_key(method, url, params=None):
+    # Endpoint + query string; the Authorization header is deliberately left
+    # out since the cached objects are the same for every token
+    return f"{method.upper()} {requests.Request(method, url, params=params).prepare().url}"
+
+
+def max_age(headers):
+    # Seconds the response may be reused without revalidating, None if it
+    # must not be stored at all
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class ResponseCache:
+    # SQLite store of GET responses with their ETag. Fresh entries (per
+    # Cache-Control max-age) are served without a request, stale ones are
+    # revalidated with If-None-Match. Least recently used entries are evicted
+    # once the stored bodies exceed max_bytes.
+    def __init__(self, path='http_cache.sqlite', max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY,
+                                etag TEXT,
+                                headers TEXT,
+                                body BLOB,
+                                expires REAL,
+                                last_used REAL,
+                                size INTEGER)''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._db.commit()
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key):
+        # Returns (etag, headers, body, fresh) or None
+        with self._lock:
+            row = self._db.execute('SELECT etag, headers, body, expires FROM responses WHERE key = ?',
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+            etag, headers, body, expires = row
+            return etag, json.loads(headers), body, now < expires
+
+    def put(self, key, headers, body):
+        age = max_age(headers)
+        etag = headers.get('ETag')
+        if age is None or (age == 0 and not etag):
+            return
+        stored_headers = {name: headers[name] for name in ('Content-Type', 'ETag', 'Cache-Control') if name in headers}
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (key, etag, json.dumps(stored_headers), body, now + age, now, len(body)))
+            self._size += len(body) - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def refresh(self, key, headers):
+        # A 304 came back: the stored body is still valid for another max-age
+        age = max_age(headers) or 0
+        with self._lock:
+            self._db.execute('UPDATE responses SET expires = ? WHERE key = ?', (time.time() + age, key))
+            self._db.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY last_used LIMIT 100').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._size -= size
+                if self._size <= self.max_bytes * 0.9:
+                    break
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+class CachingSession(requests.Session):
+    # requests.Session for spotipy that answers GETs from a ResponseCache and
+    # turns stale entries into conditional requests
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != 'GET':
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+        key = cache_key(method, url, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            etag, cached_headers, body, fresh = cached
+            if fresh:
+                self.cache.hits += 1
+                return self._cached_response(url, cached_headers, body)
+            if etag:
+                headers = dict(headers or {}, **{'If-None-Match': etag})
+        response = super().request(method, url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(key, response.headers)
+            return self._cached_response(response.url, cached_headers, body)
+        self.cache.misses += 1
+        if response.status_code == 200:
+            self.cache.put(key, response.headers, response.content)
+        return response
+
+    def _cached_response(self, url, headers, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.encoding = 'utf-8'
+        return response
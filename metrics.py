@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class ScanMetrics:
+    # Latency of every call a scan makes, per pipeline stage ('search',
+    # 'playlist', 'owner', 'export', 'emit'), plus the scan's counters (results,
+    # retries, cache hits, ...) and total. Only the latest max_samples per
+    # stage are kept for the percentiles; counts and totals cover the whole
+    # scan. The processing rate for the ETA is measured over the last
+    # rate_window seconds.
+    def __init__(self, max_samples=10000, rate_window=10.0):
+        self.max_samples = max_samples
+        self.rate_window = rate_window
+        self.samples = {}
+        self.counts = {}
+        self.totals = {}
+        self.counters = {}
+        self.total = None
+        self.started = time.monotonic()
+        self._progress = deque()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.max_samples)
+                self.counts[stage] = 0
+                self.totals[stage] = 0.0
+            self.samples[stage].append(seconds)
+            self.counts[stage] += 1
+            self.totals[stage] += seconds
+
+    @contextmanager
+    def timed(self, stage):
+        # Also usable around an await: it measures wall time
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def percentile(self, stage, q):
+        # Nearest-rank percentile in seconds, None before the first sample
+        with self._lock:
+            samples = sorted(self.samples.get(stage, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+    def update(self, **counters):
+        with self._lock:
+            self.counters.update(counters)
+
+    def progress(self, done):
+        # Playlists accounted for so far (enriched, filtered or duplicate)
+        now = time.monotonic()
+        with self._lock:
+            self._progress.append((now, done))
+            while len(self._progress) > 2 and now - self._progress[1][0] > self.rate_window:
+                self._progress.popleft()
+
+    def rate(self):
+        # Playlists per second over the last rate_window seconds
+        with self._lock:
+            if len(self._progress) < 2:
+                return None
+            (first, first_done), (last, last_done) = self._progress[0], self._progress[-1]
+        if last <= first:
+            return None
+        return (last_done - first_done) / (last - first)
+
+    def eta(self):
+        # Seconds left at the current rate, None until it can be measured
+        rate = self.rate()
+        with self._lock:
+            if not rate or self.total is None or not self._progress:
+                return None
+            done = self._progress[-1][1]
+        return max(0.0, (self.total - done) / rate)
+
+    def snapshot(self):
+        # Plain dict of everything above, safe to hand to another thread
+        stages = {}
+        for stage in list(self.counts):
+            with self._lock:
+                count, total = self.counts[stage], self.totals[stage]
+            stages[stage] = {
+                'count': count,
+                'mean': total / count,
+                'p50': self.percentile(stage, 50),
+                'p99': self.percentile(stage, 99),
+            }
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'elapsed': time.monotonic() - self.started,
+            'total': self.total,
+            'rate': self.rate(),
+            'eta': self.eta(),
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def prometheus(self, prefix='spotifyscan'):
+        # Prometheus text exposition format
+        snapshot = self.snapshot()
+        lines = [f'# TYPE {prefix}_stage_seconds summary']
+        for stage, stats in snapshot['stages'].items():
+            for q in (50, 99):
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q / 100}"}} {stats[f"p{q}"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["mean"] * stats["count"]:.6f}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        gauges = {'playlists': snapshot['total'], 'rate': snapshot['rate'], 'eta_seconds': snapshot['eta'],
+                  'elapsed_seconds': snapshot['elapsed']}
+        for name, value in gauges.items():
+            if value is not None:
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+class TimedClient:
+    # Times the spotipy calls a scan makes, per stage. Wrapped by the rate
+    # limiter (RateLimitedClient or ClientPool) rather than wrapping it, it
+    # records one sample per attempt without the limiter's waits, like
+    # AsyncSpotify does on the asyncio backend.
+    STAGES = {'search': 'search', 'playlist': 'playlist', 'user': 'owner'}
+
+    def __init__(self, client, metrics):
+        self._client = client
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        stage = self.STAGES.get(name)
+        if stage is None:
+            return attr
+
+        def call(*args, **kwargs):
+            with self._metrics.timed(stage):
+                return attr(*args, **kwargs)
+        return call
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import threading
+import time
+from aiohttp import web
+
+
+class StaticTokenAuth:
+    # Stands in for a spotipy auth manager against the mock server, which
+    # accepts any token
+    def __init__(self, token='mock-token'):
+        self.token = token
+        self.cache_handler = self
+
+    def get_access_token(self, as_dict=False):
+        return self.token
+
+    def get_cached_token(self):
+        return {'access_token': self.token, 'expires_at': time.time() + 3600}
+
+
+class MockSpotifyServer:
+    # Local stand-in for the search, playlist and user endpoints, served from
+    # a background thread. Every genre has `playlists` search results, the
+    # first `overlap` fraction of them shared by all genres; every response
+    # takes latency (+ up to jitter) seconds, every rate_limit_every-th request
+    # is answered 429 with Retry-After, and playlist descriptions are padded
+    # to payload_bytes to emulate bigger responses.
+    def __init__(self, playlists=1000, owners=100, latency=0.02, jitter=0.0, rate_limit_every=0, retry_after=1,
+                 payload_bytes=0, overlap=0.0, seed=0, host='127.0.0.1', port=0):
+        self.playlists = playlists
+        self.owners = owners
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.payload_bytes = payload_bytes
+        self.overlap = overlap
+        self.host = host
+        self.port = port
+        self.prefix = None
+        self.requests = {'search': 0, 'playlist': 0, 'user': 0}
+        self.rate_limited = 0
+        self._served = 0
+        self._random = random.Random(seed)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        # Returns the API prefix to point the clients at
+        app = web.Application()
+        app.add_routes([web.get('/v1/search', self.search),
+                        web.get('/v1/playlists/{id}', self.playlist),
+                        web.get('/v1/users/{id}', self.user)])
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        host, port = self._runner.addresses[0][:2]
+        self.prefix = f'http://{host}:{port}/v1/'
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self.prefix
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def respond(self, endpoint):
+        # The delay and the 429 every endpoint answer with; None means go ahead
+        self.requests[endpoint] += 1
+        self._served += 1
+        # Taken before the sleep: concurrent requests move the counter on meanwhile
+        served = self._served
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.rate_limit_every and served % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return web.json_response({'error': {'status': 429, 'message': 'API rate limit exceeded'}}, status=429,
+                                     headers={'Retry-After': str(self.retry_after)})
+        return None
+
+    def playlist_id(self, genre, index):
+        # Spotify IDs are base62, which spotipy checks; X separates the index
+        if index < self.overlap * self.playlists:
+            return f'sharedX{index}'
+        return ''.join(char for char in genre.lower() if char.isalnum()) + f'X{index}'
+
+    def simplified_playlist(self, playlist_id):
+        index = int(playlist_id.rsplit('X', 1)[1])
+        owner_id = f'user{index % self.owners}'
+        return {
+            'id': playlist_id,
+            'name': f'Playlist {playlist_id}',
+            'snapshot_id': f'snapshot-{playlist_id}',
+            'description': 'x' * self.payload_bytes,
+            'owner': {'id': owner_id, 'display_name': owner_id.title()},
+            'external_urls': {'spotify': f'https://open.spotify.com/playlist/{playlist_id}'},
+            'tracks': {'total': index % 200 + 1},
+        }
+
+    async def search(self, request):
+        error = await self.respond('search')
+        if error is not None:
+            return error
+        genre = request.query.get('q', '').partition('genre:')[2]
+        offset = int(request.query.get('offset', 0))
+        limit = int(request.query.get('limit', 10))
+        items = [self.simplified_playlist(self.playlist_id(genre, index))
+                 for index in range(offset, min(offset + limit, self.playlists))]
+        return web.json_response({'playlists': {'items': items, 'total': self.playlists,
+                                                'offset': offset, 'limit': limit}})
+
+    async def playlist(self, request):
+        error = await self.respond('playlist')
+        if error is not None:
+            return error
+        playlist = self.simplified_playlist(request.match_info['id'])
+        index = int(playlist['id'].rsplit('X', 1)[1])
+        playlist['followers'] = {'total': index * 7919 % 100000}
+        return web.json_response(playlist)
+
+    async def user(self, request):
+        error = await self.respond('user')
+        if error is not None:
+            return error
+        owner_id = request.match_info['id']
+        return web.json_response({'id': owner_id, 'display_name': owner_id.title()})
@@ -0,0 +1,59 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class PlaylistStore:
+    # Last enrichment of every playlist seen, keyed by playlist ID together
+    # with the snapshot_id it was built from. A playlist whose snapshot_id is
+    # unchanged on the next scan doesn't need its details or owner re-fetched.
+    def __init__(self, path='playlists.sqlite', commit_every=500):
+        self.path = path
+        self.commit_every = commit_every
+        self.unchanged = 0
+        self.changed = 0
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS playlists (
+                                id TEXT PRIMARY KEY,
+                                snapshot_id TEXT,
+                                result TEXT,
+                                updated REAL)''')
+        self._db.commit()
+
+    def get(self, playlist_id, snapshot_id):
+        # The stored result if the playlist hasn't changed since, else None
+        with self._lock:
+            row = self._db.execute('SELECT snapshot_id, result FROM playlists WHERE id = ?',
+                                   (playlist_id,)).fetchone()
+            if row is None or snapshot_id is None or row[0] != snapshot_id:
+                self.changed += 1
+                return None
+        return json.loads(row[1])
+
+    def reused(self):
+        # Counts a stored result actually used in place of fetching the
+        # playlist again (get can't tell: it may lack requested columns)
+        with self._lock:
+            self.unchanged += 1
+
+    def put(self, playlist_id, snapshot_id, result):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?)',
+                             (playlist_id, snapshot_id, json.dumps(result), time.time()))
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+def retry_after_seconds(headers, default=1.0):
+    # Spotify sends Retry-After as a number of seconds
+    if not headers:
+        return default
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def retrying_session(session=None, pool_maxsize=10):
+    # requests session for spotipy that retries server errors but hands 429s
+    # straight back, Retry-After header included, so a RateLimiter sees them.
+    # spotipy's default session sleeps out Retry-After on its own and then
+    # raises without the header.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    session = session if session is not None else requests.Session()
+    retry = Retry(total=3, read=False, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                  respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class RateLimiter:
+    # Token bucket shared by every thread that talks to the API. Requests run
+    # unthrottled until the API answers 429; then all callers wait out
+    # Retry-After and the bucket kicks in at half the rate that was being
+    # sent, creeping back up towards that rate on every success.
+    def __init__(self, max_rate=None, min_rate=1.0, recovery=0.5, max_retries=5):
+        self.max_rate = max_rate
+        self.min_rate = float(min_rate)
+        self.rate = max_rate
+        self.recovery = recovery
+        self.max_retries = max_retries
+        self.throttled = 0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._recent = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def _observed_rate(self, now):
+        if len(self._recent) < 2 or now <= self._recent[0]:
+            return self.min_rate
+        return len(self._recent) / (now - self._recent[0])
+
+    def _reserve(self):
+        # Takes a token and returns 0, or returns how long to wait before retrying
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.rate is None:
+                self._recent.append(now)
+                return 0
+            burst = max(1.0, self.rate)
+            self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._recent.append(now)
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        while wait:
+            time.sleep(wait)
+            wait = self._reserve()
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._reserve()
+
+    def blocked_for(self):
+        # Seconds left of the latest Retry-After
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def backoff(self, retry_after):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if self.rate is None:
+                self.max_rate = self._observed_rate(now)
+                self.rate = self.max_rate
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._updated = now
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def recover(self):
+        if self.rate is not None and self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def should_retry(self, error, attempt):
+        # Backs off on a 429 (and says to retry) unless out of retries
+        if getattr(error, 'http_status', None) != 429 or attempt >= self.max_retries:
+            return False
+        self.backoff(retry_after_seconds(getattr(error, 'headers', None)))
+        return True
+
+    def call(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            self.recover()
+            return result
+
+    async def call_async(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            self.recover()
+            return result
+
+
+class RateLimitedClient:
+    # Wraps a spotipy.Spotify so every API method goes through the limiter
+    def __init__(self, client, limiter):
+        self._client = client
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            return self._limiter.call(attr, *args, **kwargs)
+        return limited
@@ -0,0 +1,137 @@
+import sys
+from array import array
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+# Stored in numeric columns for values not known yet (shown empty)
+MISSING = -1
+
+
+class ResultTableModel(QAbstractTableModel):
+    # Keeps results as one array per column instead of a QTableWidgetItem per
+    # cell: numeric columns in an int array, repetitive text columns interned.
+    # Sorting only permutes the row index, built from the column arrays.
+    # Rows are also indexed by result ID so later results for the same
+    # playlist (e.g. details for a preview row) update the row in place.
+    def __init__(self, columns, numeric=('likes',), interned=('owner', 'owner_email'), parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.numeric = set(numeric)
+        self.interned = set(interned)
+        self._sort_key = None
+        self._sort_order = Qt.AscendingOrder
+        self._reset()
+
+    def _reset(self):
+        self._data = {key: array('q') if key in self.numeric else [] for _, key in self.columns}
+        self._ids = []
+        # Result ID -> storage row
+        self._rows = {}
+        # View row -> storage row
+        self._order = array('q')
+
+    def clear(self):
+        self.beginResetModel()
+        self._reset()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        key = self.columns[index.column()][1]
+        value = self._data[key][self._order[index.row()]]
+        return None if key in self.numeric and value == MISSING else value
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return super().headerData(section, orientation, role)
+
+    def result(self, row):
+        storage_row = self._order[row]
+        return {key: self._data[key][storage_row] for _, key in self.columns}
+
+    def resultId(self, row):
+        return self._ids[self._order[row]]
+
+    def _value(self, key, value):
+        if key in self.numeric:
+            return MISSING if value is None else int(value)
+        if value is None:
+            return ''
+        return sys.intern(str(value)) if key in self.interned else str(value)
+
+    def appendResults(self, results):
+        if not results:
+            return
+        first = len(self._order)
+        storage_first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(results) - 1)
+        for _, key in self.columns:
+            column = self._data[key]
+            if key in self.numeric:
+                column.extend(MISSING if result[key] is None else int(result[key]) for result in results)
+            else:
+                column.extend(self._value(key, result[key]) for result in results)
+        for storage_row, result in enumerate(results, storage_first):
+            self._ids.append(result.get('id'))
+            self._rows[result.get('id')] = storage_row
+        self._order.extend(range(storage_first, storage_first + len(results)))
+        self.endInsertRows()
+        if self._sort_key is not None:
+            self._resort()
+
+    def updateResults(self, results):
+        # Results for IDs already in the table replace their row's values;
+        # the rest are appended
+        new = []
+        updated = False
+        for result in results:
+            storage_row = self._rows.get(result.get('id'))
+            if storage_row is None:
+                new.append(result)
+                continue
+            for _, key in self.columns:
+                self._data[key][storage_row] = self._value(key, result[key])
+            updated = True
+        if updated:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._order) - 1, len(self.columns) - 1))
+            if self._sort_key is not None:
+                self._resort()
+        self.appendResults(new)
+
+    def removeResults(self, result_ids):
+        # Only the view rows go; the storage rows are left unused until clear()
+        storage_rows = {self._rows.pop(result_id) for result_id in result_ids if result_id in self._rows}
+        view_rows = [row for row, storage_row in enumerate(self._order) if storage_row in storage_rows]
+        for row in reversed(view_rows):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._order[row]
+            self.endRemoveRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_key = self.columns[column][1]
+        self._sort_order = order
+        self._resort()
+
+    def _resort(self):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        storage_rows = [self._order[index.row()] for index in persistent]
+
+        values = self._data[self._sort_key]
+        self._order = array('q', sorted(self._order, key=values.__getitem__,
+                                        reverse=self._sort_order == Qt.DescendingOrder))
+
+        if persistent:
+            view_rows = array('q', bytes(8 * len(self._ids)))
+            for view_row, storage_row in enumerate(self._order):
+                view_rows[storage_row] = view_row
+            self.changePersistentIndexList(persistent, [self.index(view_rows[row], index.column())
+                                                        for row, index in zip(storage_rows, persistent)])
+        self.layoutChanged.emit()
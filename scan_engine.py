@@ -0,0 +1,753 @@
+import asyncio
+import queue
+import time
+from itertools import count
+from contextlib import AsyncExitStack
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from ratelimit import RateLimiter, RateLimitedClient, retrying_session
+from cache import TTLCache
+from fields import playlist_fields
+from async_client import AsyncSpotify, API_PREFIX
+from client_pool import ClientPool
+from dedup import SeenIds
+from metrics import ScanMetrics, TimedClient
+
+# Shared by every Spotify call made from this process
+rate_limiter = RateLimiter()
+
+# Per client ID, for scans spread over several Spotify apps
+app_limiters = {}
+
+# Spotify search pages hold at most 50 items and stop at offset 1000
+PAGE_SIZE = 50
+MAX_SEARCH_OFFSET = 1000
+
+RESULT_KEYS = ['id', 'name', 'likes', 'owner', 'link', 'owner_email', 'additional_info', 'tracks']
+
+# Enough to refresh the follower count of an otherwise unchanged playlist
+LIKES_FIELDS = 'followers(total)'
+
+# How often a wait for pending work checks whether the scan was stopped
+STOP_POLL_INTERVAL = 0.05
+
+# Errors for a playlist (or owner) that was deleted or isn't available; the
+# playlist is skipped instead of ending the scan
+UNAVAILABLE_STATUSES = (403, 404)
+
+# fetch_details result for such a playlist
+UNAVAILABLE = object()
+
+
+def ignore(*args):
+    pass
+
+
+def succeeded(future):
+    # Works for concurrent.futures and asyncio futures alike
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+class ScanEngine:
+    # The search -> playlist -> owner pipeline without any GUI dependency.
+    # Progress is reported through plain callbacks: on_total(count),
+    # on_results(list_of_result_dicts), on_cache_stats(hits, misses) and,
+    # with a ranker, on_top(best_results) after every batch. After every page
+    # on_metrics(snapshot) gets a metrics.ScanMetrics snapshot (stage
+    # latencies, counters, rate and ETA).
+    # Each batch is also written to every export sink as it is produced.
+    # In lazy mode every search page is first reported as on_preview(results)
+    # with only the search page's data (likes and owner_email are None), and
+    # the full results follow through on_results as playlists are enriched;
+    # previews of playlists dropped by min_likes are retracted with
+    # on_discard(playlist_ids).
+    def __init__(self, genres, max_workers=8, page_workers=4, backend='threads', owner_cache=None,
+                 response_cache=None, columns=None, batch_size=200, batch_interval=0.25, max_results=None,
+                 sinks=(), checkpoint=None, playlist_store=None, refresh_likes=True, ranker=None,
+                 min_likes=None, max_pages=None, lazy=False, api_prefix=API_PREFIX, limiter=None, metrics=None,
+                 request_timeout=10,
+                 on_total=ignore, on_results=ignore, on_cache_stats=ignore,
+                 on_top=ignore, on_preview=ignore, on_discard=ignore, on_metrics=ignore):
+        self.genres = genres
+        self.columns = columns or RESULT_KEYS
+        # A topk.TopK fed with every result; whatever it ranks by is fetched too
+        self.ranker = ranker
+        if ranker is not None:
+            self.columns = self.columns + [key for key in ranker.requires if key not in self.columns]
+        # Playlists with fewer than min_likes followers are dropped as soon as
+        # their follower count is known, before the owner lookup. Search pages
+        # don't carry follower counts, so the playlist itself is still fetched
+        # unless the store already has its count.
+        self.min_likes = min_likes
+        if min_likes is not None and 'likes' not in self.columns:
+            self.columns = self.columns + ['likes']
+        # Only the first max_pages search pages of every genre are scanned
+        self.max_pages = max_pages
+        # Only download the playlist attributes the requested columns need
+        self.fields = playlist_fields(self.columns, extra=['id', 'owner.id'])
+        self.needs_owner = 'owner_email' in self.columns
+        self.max_workers = max_workers
+        self.page_workers = page_workers
+        self.backend = backend
+        self.owner_cache = owner_cache if owner_cache is not None else TTLCache()
+        # Another base URL (e.g. a local mock server) and its own rate limiter
+        # can be used instead of the Spotify API and the shared limiter
+        self.api_prefix = api_prefix
+        self.limiter = limiter if limiter is not None else rate_limiter
+        # One per app the scan runs with (see run())
+        self.limiters = [self.limiter]
+        # Seconds before a request is given up on; also bounds how long
+        # abandoned requests linger after a stop
+        self.request_timeout = request_timeout
+        # Stage latencies, counters and the measured rate
+        self.metrics = metrics if metrics is not None else ScanMetrics()
+        self.response_cache = response_cache
+        # Results are handed to on_results in batches of up to batch_size, or
+        # whatever arrived within batch_interval seconds
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_results = max_results
+        self.sinks = list(sinks)
+        # Pages and playlists recorded in the checkpoint are skipped; call
+        # checkpoint.start(genres, resume=...) before running
+        self.checkpoint = checkpoint
+        # Playlists whose snapshot_id matches the store reuse their stored
+        # result; only the follower count is re-fetched (if refresh_likes)
+        self.playlist_store = playlist_store
+        self.refresh_likes = refresh_likes and 'likes' in self.columns
+        self.on_total = on_total
+        self.on_results = on_results
+        self.on_cache_stats = on_cache_stats
+        self.on_top = on_top
+        self.lazy = lazy
+        self.on_preview = on_preview
+        self.on_discard = on_discard
+        self.on_metrics = on_metrics
+        # Lazy enrichment queue: playlists not yet picked up by a worker, the
+        # (genre, offset) page each came from and how many playlists every
+        # page is still waiting on; see prioritize()
+        self._queued = {}
+        self._page_of = {}
+        self._page_left = {}
+        self._discarded = []
+        self._seq = count()
+        self._prioritize = ignore
+        self._batch = []
+        self._batch_started = 0.0
+        # Every playlist ID found so far, so a playlist that shows up under
+        # several genres (or on shifting pages) is only enriched once
+        self.seen = SeenIds()
+        self._emitted = 0
+        self._throttled_before = self.throttled()
+        self._unchanged_before = self.playlist_store.unchanged if self.playlist_store is not None else 0
+        self.below_min_likes = 0
+        self.unavailable = 0
+        self._truncated = False
+        self._is_running = True
+
+    def run(self, auth_manager):
+        # auth_manager may also be a list, one per registered Spotify app: the
+        # scan then spreads its requests over all of them, every app with its
+        # own token and its own rate limiter
+        auth_managers = list(auth_manager) if isinstance(auth_manager, (list, tuple)) else [auth_manager]
+        if len(auth_managers) > 1:
+            self.limiters = [self.app_limiter(auth_manager) for auth_manager in auth_managers]
+        completed = False
+        self.metrics.started = time.monotonic()
+        # The limiters (and the playlist store) may be shared with earlier scans
+        self._throttled_before = self.throttled()
+        self._unchanged_before = self.playlist_store.unchanged if self.playlist_store is not None else 0
+        try:
+            if self.backend == 'asyncio':
+                asyncio.run(self.scan_async(auth_managers))
+            else:
+                self.scan_threads(auth_managers)
+            completed = self._is_running
+        finally:
+            # Whatever was fetched before a stop (or an error) still reaches the sinks
+            self.flush_results()
+            for sink in self.sinks:
+                sink.close()
+            self.owner_cache.save()
+            if self.playlist_store is not None:
+                self.playlist_store.commit()
+            self.update_metrics()
+            if self.checkpoint is not None:
+                if completed:
+                    self.checkpoint.clear()
+                else:
+                    self.checkpoint.save()
+
+    def app_limiter(self, auth_manager):
+        client_id = getattr(auth_manager, 'client_id', None)
+        if client_id is None:
+            return RateLimiter()
+        return app_limiters.setdefault(client_id, RateLimiter())
+
+    def throttled(self):
+        return sum(limiter.throttled for limiter in self.limiters)
+
+    def unchanged(self):
+        # Stored results this scan reused
+        if self.playlist_store is None:
+            return 0
+        return self.playlist_store.unchanged - self._unchanged_before
+
+    def pooled(self):
+        # With several apps the ClientPool applies the limiters, not the clients
+        return len(self.limiters) > 1
+
+    def scan_threads(self, auth_managers):
+        # The HTTP stack is imported on the first scan rather than with the
+        # engine, which keeps the GUI's start fast
+        import spotipy
+        from http_cache import CachingSession
+
+        # Keep-alive connections shared by the page and detail workers. Server
+        # errors are retried here; 429s are left to the shared rate limiter so
+        # Retry-After is honored.
+        session = retrying_session(CachingSession(self.response_cache) if self.response_cache is not None else None,
+                                   pool_maxsize=self.max_workers + self.page_workers)
+
+        clients = []
+        for auth_manager, limiter in zip(auth_managers, self.limiters):
+            client = spotipy.Spotify(auth_manager=auth_manager, requests_session=session,
+                                     requests_timeout=self.request_timeout)
+            client.prefix = self.api_prefix
+            # Timed inside the limiter, so queueing and Retry-After waits
+            # aren't counted as request latency
+            client = TimedClient(client, self.metrics)
+            clients.append(client if self.pooled() else RateLimitedClient(client, limiter))
+        sp = ClientPool(clients, self.limiters) if self.pooled() else clients[0]
+
+        page_executor = ThreadPoolExecutor(max_workers=self.page_workers)
+        detail_executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def enrich_page(genre, items):
+            return [detail_executor.submit(self.fetch_details, sp, playlist)
+                    for playlist in items if self.wanted(genre, playlist)]
+
+        def fetch_page(genre, offset):
+            return enrich_page(genre, self.search_page(sp, genre, offset)['items'])
+
+        try:
+            # The first page of every genre is fetched up front, in parallel,
+            # and also carries the totals used to schedule the remaining pages
+            first_pages = [page_executor.submit(self.search_page, sp, genre, 0) for genre in self.genres]
+            if not all(self.finished(page) for page in first_pages):
+                return
+            first_pages = [page.result() for page in first_pages]
+            self.report_total(first_pages)
+            if self.lazy:
+                return self.scan_lazy_threads(sp, page_executor, detail_executor, first_pages)
+
+            # Every remaining page of every genre is scheduled at once; results
+            # are still emitted genre by genre, page by page, in search order
+            pages = []
+            for genre, page in zip(self.genres, first_pages):
+                for offset in self.page_offsets(genre, page):
+                    if offset == 0:
+                        # Filtered right here so duplicates across first pages
+                        # resolve in genre order
+                        first = Future()
+                        first.set_result(enrich_page(genre, page['items']))
+                        pages.append((genre, offset, first))
+                    else:
+                        pages.append((genre, offset, page_executor.submit(fetch_page, genre, offset)))
+
+            for genre, offset, page in pages:
+                if not self._is_running or not self.finished(page):
+                    break
+                details = page.result()
+                while details and self.finished(details[0]):
+                    self.emit_result(details.pop(0).result())
+                if details:
+                    break
+                self.finish_page(genre, offset)
+            self.drain(pages)
+        except BaseException:
+            # An error (or Ctrl-C) ends the scan like a stop, instead of
+            # waiting for every page and detail still queued
+            self.stop()
+            raise
+        finally:
+            # After a stop nothing waits for requests still in flight; their
+            # threads finish (within request_timeout) and are discarded
+            stopped = not self._is_running
+            page_executor.shutdown(wait=not stopped, cancel_futures=stopped)
+            detail_executor.shutdown(wait=not stopped, cancel_futures=stopped)
+
+    async def scan_async(self, auth_managers):
+        async with AsyncExitStack() as stack:
+            clients = [await stack.enter_async_context(
+                           AsyncSpotify(auth_manager, max_concurrency=self.max_workers,
+                                        limiter=None if self.pooled() else limiter,
+                                        requests_timeout=self.request_timeout, prefix=self.api_prefix,
+                                        response_cache=self.response_cache, metrics=self.metrics))
+                       for auth_manager, limiter in zip(auth_managers, self.limiters)]
+            sp = ClientPool(clients, self.limiters) if self.pooled() else clients[0]
+
+            def enrich_page(genre, items):
+                return [asyncio.create_task(self.fetch_details_async(sp, playlist))
+                        for playlist in items if self.wanted(genre, playlist)]
+
+            async def fetch_page(genre, offset):
+                return enrich_page(genre, (await self.search_page_async(sp, genre, offset))['items'])
+
+            try:
+                async def search_first_pages():
+                    return await asyncio.gather(*(self.search_page_async(sp, genre, 0) for genre in self.genres))
+
+                first_pages = asyncio.create_task(search_first_pages())
+                if not await self.finished_async(first_pages):
+                    return
+                first_pages = first_pages.result()
+                self.report_total(first_pages)
+                if self.lazy:
+                    return await self.scan_lazy_async(sp, first_pages)
+
+                pages = []
+                for genre, page in zip(self.genres, first_pages):
+                    for offset in self.page_offsets(genre, page):
+                        if offset == 0:
+                            first = asyncio.get_running_loop().create_future()
+                            first.set_result(enrich_page(genre, page['items']))
+                            pages.append((genre, offset, first))
+                        else:
+                            pages.append((genre, offset, asyncio.create_task(fetch_page(genre, offset))))
+
+                for genre, offset, page in pages:
+                    if not self._is_running or not await self.finished_async(page):
+                        break
+                    details = page.result()
+                    while details and await self.finished_async(details[0]):
+                        self.emit_result(details.pop(0).result())
+                    if details:
+                        break
+                    self.finish_page(genre, offset)
+                self.drain(pages)
+            finally:
+                # Cancelling aborts every request in flight right away
+                tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def finished(self, future):
+        # Waits for a future; False if the scan is stopped before it is done
+        while not future.done():
+            if not self._is_running:
+                return False
+            wait([future], timeout=STOP_POLL_INTERVAL)
+            self.flush_due()
+        return True
+
+    async def finished_async(self, future):
+        while not future.done():
+            if not self._is_running:
+                return False
+            await asyncio.wait([future], timeout=STOP_POLL_INTERVAL)
+            self.flush_due()
+        return True
+
+    def drain(self, pages):
+        # After a stop, results already fetched are still emitted; emitted
+        # ones were popped off their page's list
+        for _, _, page in pages:
+            if not succeeded(page):
+                continue
+            for detail in page.result():
+                if succeeded(detail):
+                    self.emit_result(detail.result())
+
+    def scan_lazy_threads(self, sp, page_executor, detail_executor, first_pages):
+        # Search pages are previewed in order as they arrive while max_workers
+        # enrichment threads work through a priority queue of their playlists
+        pending = queue.PriorityQueue()
+        done = queue.Queue()
+        self._prioritize = pending.put
+
+        def enrich():
+            while True:
+                _, _, playlist = pending.get()
+                if playlist is None:
+                    return
+                # Prioritized playlists are queued twice; whoever comes second skips it
+                if self._queued.pop(playlist['id'], None) is None:
+                    continue
+                try:
+                    done.put((playlist['id'], self.fetch_details(sp, playlist), None))
+                except Exception as e:
+                    done.put((playlist['id'], None, e))
+
+        for _ in range(self.max_workers):
+            detail_executor.submit(enrich)
+
+        pages = []
+        for genre, page in zip(self.genres, first_pages):
+            for offset in self.page_offsets(genre, page):
+                if offset == 0:
+                    first = Future()
+                    first.set_result(page)
+                    pages.append((genre, offset, first))
+                else:
+                    pages.append((genre, offset, page_executor.submit(self.search_page, sp, genre, offset)))
+
+        def drain(block):
+            # After a stop only what is already done gets emitted
+            while self._page_of and (self._is_running or not block):
+                try:
+                    playlist_id, result, error = done.get(timeout=0.1) if block else done.get_nowait()
+                except queue.Empty:
+                    if not block:
+                        break
+                    self.flush_due()
+                    continue
+                if error is not None:
+                    raise error
+                self.finish_playlist(playlist_id, result)
+            self.flush_discarded()
+
+        try:
+            for genre, offset, page in pages:
+                if not self._is_running or not self.finished(page):
+                    break
+                for playlist in self.queue_page(genre, offset, page.result()['items']):
+                    pending.put(playlist)
+                drain(block=False)
+            drain(block=True)
+            drain(block=False)
+        finally:
+            self._prioritize = ignore
+            self.retract_unfinished()
+            page_executor.shutdown(wait=False, cancel_futures=True)
+            # Sentinels sort ahead of any queued playlist, so the workers stop right away
+            for _ in range(self.max_workers):
+                pending.put((-1, next(self._seq), None))
+
+    async def scan_lazy_async(self, sp, first_pages):
+        pending = asyncio.PriorityQueue()
+        done = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        def prioritize(item):
+            try:
+                loop.call_soon_threadsafe(pending.put_nowait, item)
+            except RuntimeError:
+                # The scan (and its loop) already finished
+                pass
+
+        self._prioritize = prioritize
+
+        async def enrich():
+            while True:
+                _, _, playlist = await pending.get()
+                if self._queued.pop(playlist['id'], None) is None:
+                    continue
+                try:
+                    await done.put((playlist['id'], await self.fetch_details_async(sp, playlist), None))
+                except Exception as e:
+                    await done.put((playlist['id'], None, e))
+
+        workers = [asyncio.create_task(enrich()) for _ in range(self.max_workers)]
+
+        pages = []
+        for genre, page in zip(self.genres, first_pages):
+            for offset in self.page_offsets(genre, page):
+                if offset == 0:
+                    first = loop.create_future()
+                    first.set_result(page)
+                    pages.append((genre, offset, first))
+                else:
+                    pages.append((genre, offset, asyncio.create_task(self.search_page_async(sp, genre, offset))))
+
+        async def drain(block):
+            # After a stop only what is already done gets emitted
+            while self._page_of and (self._is_running or not block):
+                try:
+                    if block:
+                        playlist_id, result, error = await asyncio.wait_for(done.get(), 0.1)
+                    else:
+                        playlist_id, result, error = done.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    if not block:
+                        break
+                    self.flush_due()
+                    continue
+                if error is not None:
+                    raise error
+                self.finish_playlist(playlist_id, result)
+            self.flush_discarded()
+
+        try:
+            for genre, offset, page in pages:
+                if not self._is_running or not await self.finished_async(page):
+                    break
+                for playlist in self.queue_page(genre, offset, page.result()['items']):
+                    pending.put_nowait(playlist)
+                await drain(block=False)
+            await drain(block=True)
+            await drain(block=False)
+        finally:
+            self._prioritize = ignore
+            self.retract_unfinished()
+            tasks = workers + [task for _, _, task in pages]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def queue_page(self, genre, offset, items):
+        # Previews a search page and returns its queue entries for enrichment
+        playlists = [playlist for playlist in items if self.wanted(genre, playlist)]
+        if not playlists:
+            self.finish_page(genre, offset)
+            return []
+        self.on_preview([self.make_preview(playlist) for playlist in playlists])
+        self._page_left[genre, offset] = len(playlists)
+        entries = []
+        for playlist in playlists:
+            self._queued[playlist['id']] = playlist
+            self._page_of[playlist['id']] = (genre, offset)
+            entries.append((1, next(self._seq), playlist))
+        return entries
+
+    def finish_playlist(self, playlist_id, result):
+        if result is None or result is UNAVAILABLE:
+            self._discarded.append(playlist_id)
+        self.emit_result(result)
+        page = self._page_of.pop(playlist_id)
+        self._page_left[page] -= 1
+        if not self._page_left[page]:
+            del self._page_left[page]
+            self.finish_page(*page)
+
+    def retract_unfinished(self):
+        # A scan cut short by max_results won't enrich the playlists it
+        # still has queued, so their previews are retracted too
+        if self.max_results is not None and self._emitted >= self.max_results:
+            self._discarded.extend(self._page_of)
+            self._page_of.clear()
+            self._queued.clear()
+        self.flush_discarded()
+
+    def flush_discarded(self):
+        if self._discarded:
+            discarded, self._discarded = self._discarded, []
+            self.on_discard(discarded)
+
+    def prioritize(self, playlist_ids):
+        # Moves playlists still waiting for lazy enrichment (e.g. the rows
+        # on screen) to the front of the queue; safe to call from any thread
+        for playlist_id in playlist_ids:
+            playlist = self._queued.get(playlist_id)
+            if playlist is not None:
+                self._prioritize((0, next(self._seq), playlist))
+
+    def page_offsets(self, genre, first_page):
+        offsets = range(0, min(first_page['total'], MAX_SEARCH_OFFSET + 1), PAGE_SIZE)[:self.max_pages]
+        if self.checkpoint is None:
+            return offsets
+        return [offset for offset in offsets if not self.checkpoint.page_done(genre, offset)]
+
+    def reachable(self, first_page):
+        # Search results past MAX_SEARCH_OFFSET can't be paged to
+        reachable = min(first_page['total'], MAX_SEARCH_OFFSET + PAGE_SIZE)
+        if self.max_pages is not None:
+            reachable = min(reachable, self.max_pages * PAGE_SIZE)
+        return reachable
+
+    def report_total(self, first_pages):
+        total = sum(self.reachable(page) for page in first_pages)
+        if self.checkpoint is not None:
+            total = max(0, total - len(self.checkpoint.processed))
+        self.metrics.total = total
+        self.on_total(total)
+
+    def wanted(self, genre, playlist):
+        # Search pages occasionally contain null entries
+        if not playlist:
+            return False
+        if not self.seen.add(playlist['id'], self.genres.index(genre)):
+            return False
+        return self.checkpoint is None or playlist['id'] not in self.checkpoint.processed
+
+    def matched_genres(self, playlist_id):
+        # Every genre the playlist turned up under so far, in search order
+        return [self.genres[index] for index in self.seen.genres(playlist_id)]
+
+    def finish_page(self, genre, offset):
+        # A page cut short by max_results isn't done yet
+        if self.checkpoint is not None and not self._truncated:
+            self.checkpoint.mark_page(genre, offset)
+        self.on_cache_stats(self.owner_cache.hits, self.owner_cache.misses)
+        self.update_metrics()
+
+    def update_metrics(self):
+        metrics = self.metrics
+        metrics.progress(self._emitted + self.below_min_likes + self.unavailable + self.seen.duplicates)
+        metrics.update(results=self._emitted,
+                       below_min_likes=self.below_min_likes,
+                       unavailable=self.unavailable,
+                       duplicates=self.seen.duplicates,
+                       retries=self.throttled() - self._throttled_before,
+                       owner_cache_hits=self.owner_cache.hits,
+                       owner_cache_misses=self.owner_cache.misses)
+        if self.response_cache is not None:
+            metrics.update(response_cache_hits=self.response_cache.hits,
+                           response_cache_revalidated=self.response_cache.revalidated,
+                           response_cache_misses=self.response_cache.misses)
+        if self.playlist_store is not None:
+            metrics.update(playlists_unchanged=self.unchanged())
+        self.on_metrics(metrics.snapshot())
+
+    def emit_result(self, result):
+        # None stands for a playlist below min_likes
+        if result is None:
+            self.below_min_likes += 1
+            return
+        if result is UNAVAILABLE:
+            self.unavailable += 1
+            return
+        if self.max_results is not None and self._emitted >= self.max_results:
+            self._truncated = True
+            if self.lazy:
+                # Its preview is already showing
+                self._discarded.append(result['id'])
+            return
+        self._emitted += 1
+        if self.checkpoint is not None:
+            self.checkpoint.mark_processed(result['id'])
+        if self._emitted == self.max_results:
+            self.stop()
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append(result)
+        if len(self._batch) >= self.batch_size:
+            self.flush_results()
+        else:
+            self.flush_due()
+
+    def flush_due(self):
+        # Also called while the scan waits, so a batch goes out within
+        # batch_interval even when no further result arrives to trigger it
+        if self._batch and time.monotonic() - self._batch_started >= self.batch_interval:
+            self.flush_results()
+
+    def flush_results(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            if self.sinks:
+                with self.metrics.timed('export'):
+                    for sink in self.sinks:
+                        sink.write(batch)
+            with self.metrics.timed('emit'):
+                self.on_results(batch)
+            if self.ranker is not None:
+                self.ranker.update(batch)
+                self.on_top(self.ranker.top())
+
+    def search_page(self, sp, genre, offset):
+        return sp.search(q=f'genre:{genre}', type='playlist', limit=PAGE_SIZE, offset=offset)['playlists']
+
+    async def search_page_async(self, sp, genre, offset):
+        return (await sp.search(q=f'genre:{genre}', type='playlist', limit=PAGE_SIZE, offset=offset))['playlists']
+
+    def fetch_details(self, sp, playlist):
+        try:
+            return self.load_details(sp, playlist)
+        except Exception as e:
+            if getattr(e, 'http_status', None) not in UNAVAILABLE_STATUSES:
+                raise
+            return UNAVAILABLE
+
+    async def fetch_details_async(self, sp, playlist):
+        try:
+            return await self.load_details_async(sp, playlist)
+        except Exception as e:
+            if getattr(e, 'http_status', None) not in UNAVAILABLE_STATUSES:
+                raise
+            return UNAVAILABLE
+
+    def load_details(self, sp, playlist):
+        def load_owner(owner_id):
+            return sp.user(owner_id)
+
+        result = self.stored_result(playlist)
+        if result is not None:
+            if self.refresh_likes:
+                result['likes'] = sp.playlist(playlist['id'], fields=LIKES_FIELDS)['followers']['total']
+                # So the next scan starts from the refreshed count
+                self.store_result(playlist, result)
+            return None if self.too_few_likes(result.get('likes')) else result
+        detailed_playlist = sp.playlist(playlist['id'], fields=self.fields)
+        if self.too_few_likes((detailed_playlist.get('followers') or {}).get('total')):
+            return None
+        owner_profile = {}
+        if self.needs_owner:
+            owner_profile = self.owner_cache.get_or_load(detailed_playlist['owner']['id'], load_owner)
+        return self.store_result(playlist, self.make_result(detailed_playlist, owner_profile))
+
+    async def load_details_async(self, sp, playlist):
+        async def load_owner(owner_id):
+            return await sp.user(owner_id)
+
+        result = self.stored_result(playlist)
+        if result is not None:
+            if self.refresh_likes:
+                result['likes'] = (await sp.playlist(playlist['id'], fields=LIKES_FIELDS))['followers']['total']
+                # So the next scan starts from the refreshed count
+                self.store_result(playlist, result)
+            return None if self.too_few_likes(result.get('likes')) else result
+        detailed_playlist = await sp.playlist(playlist['id'], fields=self.fields)
+        if self.too_few_likes((detailed_playlist.get('followers') or {}).get('total')):
+            return None
+        owner_profile = {}
+        if self.needs_owner:
+            owner_profile = await self.owner_cache.get_or_load_async(detailed_playlist['owner']['id'], load_owner)
+        return self.store_result(playlist, self.make_result(detailed_playlist, owner_profile))
+
+    def too_few_likes(self, likes):
+        return self.min_likes is not None and (likes or 0) < self.min_likes
+
+    def stored_result(self, playlist):
+        # The previous enrichment of a playlist whose snapshot_id hasn't changed
+        if self.playlist_store is None:
+            return None
+        result = self.playlist_store.get(playlist['id'], playlist.get('snapshot_id'))
+        if result is None or any(key not in result for key in self.columns):
+            return None
+        # Without the likes column the stored result can't be checked against min_likes
+        if self.min_likes is not None and 'likes' not in result:
+            return None
+        self.playlist_store.reused()
+        return result
+
+    def store_result(self, playlist, result):
+        if self.playlist_store is not None:
+            self.playlist_store.put(playlist['id'], playlist.get('snapshot_id'), result)
+        return result
+
+    def make_preview(self, playlist):
+        # Search pages have everything but the follower count and owner profile
+        result = self.make_result(playlist, {})
+        for key in ('likes', 'owner_email'):
+            if key in result:
+                result[key] = None
+        return result
+
+    def make_result(self, detailed_playlist, owner_profile):
+        # Only the attributes for the requested columns were fetched
+        owner = detailed_playlist.get('owner') or {}
+        result = {
+            'id': detailed_playlist['id'],
+            'name': detailed_playlist.get('name'),
+            'likes': (detailed_playlist.get('followers') or {}).get('total'),
+            'owner': owner.get('display_name'),
+            'link': (detailed_playlist.get('external_urls') or {}).get('spotify'),
+            'owner_email': owner_profile.get('email', 'N/A'),
+            'additional_info': detailed_playlist.get('description', 'N/A'),
+            'tracks': (detailed_playlist.get('tracks') or {}).get('total'),
+        }
+        return {key: result[key] for key in ['id'] + self.columns}
+
+    def stop(self):
+        self._is_running = False
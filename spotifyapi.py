@@ -1,8 +1,13 @@
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-import pandas as pd
 import json
 import os
+import asyncio
+from fields import playlist_fields
+from async_client import AsyncSpotify
+from ratelimit import RateLimitedClient, retrying_session
+from scan_engine import rate_limiter
+from topk import TopK
 
 # Load credentials from the file
 with open('creds_spotify.json', 'r') as file:
@@ -12,33 +17,77 @@ with open('creds_spotify.json', 'r') as file:
 sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
                                                client_secret=creds['client_secret'],
                                                redirect_uri=creds['redirect_uri'],
-                                               scope="playlist-read-private"))
+                                               scope="playlist-read-private"),
+                     requests_session=retrying_session())
 
-def search_playlists_by_genre(genres):
+RESULT_KEYS = ['name', 'followers', 'owner', 'link']
+
+def search_playlists_by_genre(genres, backend='threads'):
+    if backend == 'asyncio':
+        return asyncio.run(search_playlists_by_genre_async(genres))
+    # Only download the playlist attributes the result needs
+    fields = playlist_fields(RESULT_KEYS)
+    # 429s back off through the limiter every scan in this process shares
+    client = RateLimitedClient(sp, rate_limiter)
+    pages = [client.search(q=f'genre:{genre}', type='playlist', limit=50) for genre in genres]
     results = []
-    for genre in genres:
-        playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50)
-        for playlist in playlists['playlists']['items']:
-            # Fetch detailed playlist information to get the follower count
-            playlist_id = playlist['id']
-            detailed_playlist = sp.playlist(playlist_id)
-            results.append({
-                'name': detailed_playlist['name'],
-                'followers': detailed_playlist['followers']['total'],
-                'owner': detailed_playlist['owner']['display_name'],
-                'link': detailed_playlist['external_urls']['spotify']
-            })
+    for playlist, matched in unique_playlists(genres, pages):
+        # Fetch detailed playlist information to get the follower count
+        detailed_playlist = client.playlist(playlist['id'], fields=fields)
+        results.append(make_result(detailed_playlist, matched))
     return results
 
-def main():
+async def search_playlists_by_genre_async(genres, max_concurrency=50):
+    fields = playlist_fields(RESULT_KEYS)
+    async with AsyncSpotify(sp.auth_manager, max_concurrency=max_concurrency, limiter=rate_limiter,
+                            prefix=sp.prefix) as client:
+        pages = await asyncio.gather(*(client.search(q=f'genre:{genre}', type='playlist', limit=50)
+                                       for genre in genres))
+        playlists = unique_playlists(genres, pages)
+        details = await asyncio.gather(*(client.playlist(playlist['id'], fields=fields)
+                                         for playlist, _ in playlists))
+    return [make_result(detailed_playlist, matched) for detailed_playlist, (_, matched) in zip(details, playlists)]
+
+def unique_playlists(genres, pages):
+    # A playlist found under several genres is only fetched once; the genres
+    # it matched are kept for the result
+    unique = {}
+    for genre, page in zip(genres, pages):
+        for playlist in page['playlists']['items']:
+            if playlist:
+                unique.setdefault(playlist['id'], (playlist, []))[1].append(genre)
+    return list(unique.values())
+
+def make_result(detailed_playlist, genres):
+    return {
+        'name': detailed_playlist['name'],
+        'followers': detailed_playlist['followers']['total'],
+        'owner': detailed_playlist['owner']['display_name'],
+        'link': detailed_playlist['external_urls']['spotify'],
+        'genres': ', '.join(genres)
+    }
+
+def format_table(results, keys=RESULT_KEYS + ['genres']):
+    # Plain-text table, numbers right-aligned; pandas isn't worth importing
+    # just to print this
+    rows = [[str(result[key]) for key in keys] for result in results]
+    widths = [max([len(key)] + [len(row[i]) for row in rows]) for i, key in enumerate(keys)]
+    numeric = [all(isinstance(result[key], int) for result in results) for key in keys]
+    lines = [' '.join(key.rjust(width) for key, width in zip(keys, widths))]
+    for row in rows:
+        lines.append(' '.join(value.rjust(width) if is_numeric else value.ljust(width)
+                              for value, width, is_numeric in zip(row, widths, numeric)))
+    return '\n'.join(lines)
+
+def main(top=20):
     genres = ['drum and bass', 'idm', 'electro']
     playlists = search_playlists_by_genre(genres)
 
-    # Convert results to DataFrame and sort by followers
-    df = pd.DataFrame(playlists)
-    df = df.sort_values(by='followers', ascending=False)
+    # Only the most followed playlists are ranked and shown
+    ranker = TopK(k=top, key='followers')
+    ranker.update(playlists)
 
-    print(df.to_string(index=False))
+    print(format_table(ranker.top()))
 
 if __name__ == '__main__':
     main()
@@ -1,22 +1,15 @@
 import sys
-import json
-import time
 import base64
-from cryptography.fernet import Fernet
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from ratelimit import RateLimiter, RateLimitedClient, retrying_session
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, 
                              QComboBox, QHBoxLayout, QProgressBar, QTableWidget, QTableWidgetItem)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
-# Generate a key for encryption
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
-
-# Save the key securely
-with open('cipher_key.key', 'wb') as key_file:
-    key_file.write(key)
+# Shared by every Spotify call made from this process
+rate_limiter = RateLimiter()
 
 class Worker(QThread):
     progress = pyqtSignal(int)
@@ -29,13 +22,13 @@ class Worker(QThread):
     
     def run(self):
         results = []
-        creds = json.loads(cipher_suite.decrypt(self.creds.encode()).decode())
-        
         # Authenticate with Spotify
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
-                                                       client_secret=creds['client_secret'],
-                                                       redirect_uri=creds['redirect_uri'],
-                                                       scope="playlist-read-private"))
+        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=self.creds['client_id'],
+                                                       client_secret=self.creds['client_secret'],
+                                                       redirect_uri=self.creds['redirect_uri'],
+                                                       scope="playlist-read-private"),
+                             requests_session=retrying_session())
+        sp = RateLimitedClient(sp, rate_limiter)
         
         for genre in self.genres:
             playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50)
@@ -51,7 +44,6 @@ class Worker(QThread):
                     'owner_email': owner_profile.get('email', 'N/A'),
                     'additional_info': detailed_playlist.get('description', 'N/A')
                 })
-                time.sleep(0.1)  # Simulate processing time
                 self.progress.emit(1)
         
         self.result.emit(results)
@@ -133,9 +125,7 @@ class App(QWidget):
             "client_secret": api_secret,
             "redirect_uri": "http://localhost:8888/callback"
         }
-        encoded_creds = cipher_suite.encrypt(json.dumps(creds).encode()).decode()
-        
-        self.worker = Worker([genre], encoded_creds)
+        self.worker = Worker([genre], creds)
         self.worker.progress.connect(self.updateProgress)
         self.worker.result.connect(self.displayResult)
         
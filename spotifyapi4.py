@@ -1,9 +1,9 @@
 import sys
 import json
-import time
-from cryptography.fernet import Fernet
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from ratelimit import RateLimiter, RateLimitedClient, retrying_session
+from topk import TopK
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, 
                              QComboBox, QHBoxLayout, QProgressBar, QTableWidget, QTableWidgetItem, 
@@ -11,13 +11,8 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QL
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap
 
-# Generate a key for encryption
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
-
-# Save the key securely
-with open('cipher_key.key', 'wb') as key_file:
-    key_file.write(key)
+# Shared by every Spotify call made from this process
+rate_limiter = RateLimiter()
 
 class Worker(QThread):
     progress = pyqtSignal(int)
@@ -27,16 +22,18 @@ class Worker(QThread):
         super().__init__()
         self.genres = genres
         self.creds = creds
+        # Tracks the most followed playlist as results arrive
+        self.ranker = TopK(k=1, key='followers')
     
     def run(self):
         results = []
-        creds = json.loads(cipher_suite.decrypt(self.creds.encode()).decode())
-        
         # Authenticate with Spotify
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
-                                                       client_secret=creds['client_secret'],
-                                                       redirect_uri=creds['redirect_uri'],
-                                                       scope="playlist-read-private"))
+        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=self.creds['client_id'],
+                                                       client_secret=self.creds['client_secret'],
+                                                       redirect_uri=self.creds['redirect_uri'],
+                                                       scope="playlist-read-private"),
+                             requests_session=retrying_session())
+        sp = RateLimitedClient(sp, rate_limiter)
         
         for genre in self.genres:
             playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50)
@@ -44,19 +41,18 @@ class Worker(QThread):
                 playlist_id = playlist['id']
                 detailed_playlist = sp.playlist(playlist_id)
                 owner_profile = sp.user(detailed_playlist['owner']['id'])
-                results.append({
+                result = {
                     'name': detailed_playlist['name'],
                     'followers': detailed_playlist['followers']['total'],
                     'owner': detailed_playlist['owner']['display_name'],
                     'link': detailed_playlist['external_urls']['spotify'],
                     'owner_email': owner_profile.get('email', 'N/A'),
                     'additional_info': detailed_playlist.get('description', 'N/A')
-                })
-                time.sleep(0.1)  # Simulate processing time
+                }
+                results.append(result)
+                self.ranker.add(result)
                 self.progress.emit(1)
         
-        # Sort results by number of followers in descending order
-        results = sorted(results, key=lambda x: x['followers'], reverse=True)
         self.result.emit(results)
 
 class AboutDialog(QDialog):
@@ -207,9 +203,7 @@ class App(QMainWindow):
             "client_secret": api_secret,
             "redirect_uri": "http://localhost:8888/callback"
         }
-        encoded_creds = cipher_suite.encrypt(json.dumps(creds).encode()).decode()
-        
-        self.worker = Worker([genre], encoded_creds)
+        self.worker = Worker([genre], creds)
         self.worker.progress.connect(self.updateProgress)
         self.worker.result.connect(self.displayResult)
         
@@ -222,18 +216,26 @@ class App(QMainWindow):
         self.progressBar.setValue(self.progressBar.value() + value)
     
     def displayResult(self, results):
+        # Rows would move while being filled with sorting on
+        self.resultTable.setSortingEnabled(False)
         self.resultTable.setRowCount(len(results))
         for row, result in enumerate(results):
             self.resultTable.setItem(row, 0, QTableWidgetItem(result['name']))
-            self.resultTable.setItem(row, 1, QTableWidgetItem(str(result['followers'])))
+            # Stored as a number so the column sorts numerically
+            followers = QTableWidgetItem()
+            followers.setData(Qt.DisplayRole, result['followers'])
+            self.resultTable.setItem(row, 1, followers)
             self.resultTable.setItem(row, 2, QTableWidgetItem(result['owner']))
             self.resultTable.setItem(row, 3, QTableWidgetItem(result['link']))
             self.resultTable.setItem(row, 4, QTableWidgetItem(result['owner_email']))
             self.resultTable.setItem(row, 5, QTableWidgetItem(result['additional_info']))
+        # Most followed first, as before; the headers can re-sort it
+        self.resultTable.setSortingEnabled(True)
+        self.resultTable.sortItems(1, Qt.DescendingOrder)
         
-        # Select the playlist with the highest number of followers
+        # The playlist with the highest number of followers
         if results:
-            best_playlist = results[0]
+            best_playlist = self.worker.ranker.top()[0]
             QMessageBox.information(self, 'Best Playlist', f"Best Playlist:\n"
                                                           f"Name: {best_playlist['name']}\n"
                                                           f"Followers: {best_playlist['followers']}\n"
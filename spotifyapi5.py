@@ -1,9 +1,8 @@
 import sys
 import json
-import time
-from cryptography.fernet import Fernet
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from ratelimit import RateLimiter, RateLimitedClient, retrying_session
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, 
                              QComboBox, QHBoxLayout, QProgressBar, QTableWidget, QTableWidgetItem, 
                              QMenuBar, QMenu, QAction, QMessageBox, QDialog)
@@ -11,13 +10,8 @@ from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QPixmap
 import os
 
-# Generate a key for encryption
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
-
-# Save the key securely
-with open('cipher_key.key', 'wb') as key_file:
-    key_file.write(key)
+# Shared by every Spotify call made from this process
+rate_limiter = RateLimiter()
 
 class Worker(QThread):
     progress = pyqtSignal(int)
@@ -29,13 +23,13 @@ class Worker(QThread):
         self.creds = creds
     
     def run(self):
-        creds = json.loads(cipher_suite.decrypt(self.creds.encode()).decode())
-        
         # Authenticate with Spotify
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
-                                                       client_secret=creds['client_secret'],
-                                                       redirect_uri=creds['redirect_uri'],
-                                                       scope="playlist-read-private"))
+        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=self.creds['client_id'],
+                                                       client_secret=self.creds['client_secret'],
+                                                       redirect_uri=self.creds['redirect_uri'],
+                                                       scope="playlist-read-private"),
+                             requests_session=retrying_session())
+        sp = RateLimitedClient(sp, rate_limiter)
         
         for genre in self.genres:
             playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50)
@@ -52,7 +46,6 @@ class Worker(QThread):
                     'additional_info': detailed_playlist.get('description', 'N/A')
                 }
                 self.new_result.emit(result)
-                time.sleep(0.1)  # Simulate processing time
                 self.progress.emit(1)
 
 class AboutDialog(QDialog):
@@ -230,9 +223,7 @@ class App(QMainWindow):
             "client_secret": api_secret,
             "redirect_uri": "http://localhost:8888/callback"
         }
-        encoded_creds = cipher_suite.encrypt(json.dumps(creds).encode()).decode()
-        
-        self.worker = Worker([genre], encoded_creds)
+        self.worker = Worker([genre], creds)
         self.worker.progress.connect(self.updateProgress)
         self.worker.new_result.connect(self.addResult)
         
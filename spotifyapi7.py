@@ -1,22 +1,17 @@
 import sys
 import json
-import time
-from cryptography.fernet import Fernet
+from credentials import CredentialsService
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from ratelimit import RateLimiter, RateLimitedClient, retrying_session
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton, 
                              QComboBox, QHBoxLayout, QProgressBar, QTableWidget, QTableWidgetItem, 
                              QMenuBar, QMenu, QAction, QMessageBox, QDialog)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QPixmap
 
-# Generate a key for encryption
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
-
-# Save the key securely
-with open('cipher_key.key', 'wb') as key_file:
-    key_file.write(key)
+# Shared by every Spotify call made from this process
+rate_limiter = RateLimiter()
 
 class Worker(QThread):
     progress = pyqtSignal(int)
@@ -28,13 +23,13 @@ class Worker(QThread):
         self.creds = creds
     
     def run(self):
-        creds = json.loads(cipher_suite.decrypt(self.creds.encode()).decode())
-        
         # Authenticate with Spotify
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
-                                                       client_secret=creds['client_secret'],
-                                                       redirect_uri=creds['redirect_uri'],
-                                                       scope="playlist-read-private"))
+        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=self.creds['client_id'],
+                                                       client_secret=self.creds['client_secret'],
+                                                       redirect_uri=self.creds['redirect_uri'],
+                                                       scope="playlist-read-private"),
+                             requests_session=retrying_session())
+        sp = RateLimitedClient(sp, rate_limiter)
         
         for genre in self.genres:
             playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50)
@@ -51,7 +46,6 @@ class Worker(QThread):
                     'additional_info': detailed_playlist.get('description', 'N/A')
                 }
                 self.new_result.emit(result)
-                time.sleep(0.1)  # Simulate processing time
                 self.progress.emit(1)
 
 class AboutDialog(QDialog):
@@ -77,6 +71,8 @@ class AboutDialog(QDialog):
 class App(QMainWindow):
     def __init__(self):
         super().__init__()
+        # Read (and decrypted, if encrypted) once, then reused by every search
+        self.credentials = CredentialsService('credentials.json')
         self.initUI()
     
     def initUI(self):
@@ -149,11 +145,12 @@ class App(QMainWindow):
     
     def viewSavedCredentials(self):
         try:
-            with open('credentials.json', 'r') as file:
-                creds = json.load(file)
-                QMessageBox.information(self, 'Saved Credentials', json.dumps(creds, indent=4))
+            creds = self.credentials.credentials()
+            QMessageBox.information(self, 'Saved Credentials', json.dumps(creds, indent=4))
         except FileNotFoundError:
             QMessageBox.warning(self, 'Error', 'No saved credentials found.')
+        except ValueError:
+            QMessageBox.warning(self, 'Error', 'Cannot read the saved credentials.')
     
     def showAboutDialog(self):
         about_dialog = AboutDialog()
@@ -164,18 +161,19 @@ class App(QMainWindow):
         self.resultTable.setRowCount(0)
         
         try:
-            with open('credentials.json', 'r') as file:
-                creds = json.load(file)
+            creds = self.credentials.credentials()
         except FileNotFoundError:
             QMessageBox.warning(self, 'Error', 'No credentials file found.')
             self.search_button.setEnabled(True)
             return
-        
-        encoded_creds = cipher_suite.encrypt(json.dumps(creds).encode()).decode()
+        except ValueError:
+            QMessageBox.warning(self, 'Error', 'Cannot read the credentials file.')
+            self.search_button.setEnabled(True)
+            return
         
         genre = self.genre_combo.currentText()
         
-        self.worker = Worker([genre], encoded_creds)
+        self.worker = Worker([genre], creds)
         self.worker.progress.connect(self.updateProgress)
         self.worker.new_result.connect(self.addResult)
         
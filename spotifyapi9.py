@@ -1,77 +1,74 @@
+import time
+# --startup-time measures from here, before anything else is imported
+STARTED = time.perf_counter()
 import sys
 import json
-import time
-from cryptography.fernet import Fernet
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from cache import TTLCache
+from scan_engine import ScanEngine
+from result_model import ResultTableModel
+from export_sinks import open_sink
+from checkpoint import ScanCheckpoint
+from playlist_store import PlaylistStore
+from topk import TopK
+from credentials import CredentialsService
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton, 
-                             QComboBox, QHBoxLayout, QProgressBar, QTableWidget, QTableWidgetItem, 
-                             QMenuBar, QMenu, QAction, QMessageBox, QDialog)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot
-from PyQt5.QtGui import QPixmap
+                             QComboBox, QHBoxLayout, QProgressBar, QTableView, 
+                             QSpinBox, QCheckBox, QGroupBox, QMenuBar, QMenu, QAction, QMessageBox, QDialog, QFileDialog)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QPixmap, QFontDatabase
 
-# Generate a key for encryption
-key = Fernet.generate_key()
-cipher_suite = Fernet(key)
+# Table header -> result key
+COLUMNS = [
+    ("Name", 'name'),
+    ("Likes", 'likes'),
+    ("Owner", 'owner'),
+    ("Link", 'link'),
+    ("Owner Email", 'owner_email'),
+    ("Additional Info", 'additional_info'),
+]
 
-# Save the key securely
-with open('cipher_key.key', 'wb') as key_file:
-    key_file.write(key)
+# How many of the best playlists are shown while searching
+TOP_PLAYLISTS = 5
 
 class Worker(QThread):
     progress = pyqtSignal(int)
-    new_result = pyqtSignal(dict)
+    new_results = pyqtSignal(list)
     finished = pyqtSignal()
     total_playlists = pyqtSignal(int)
+    cache_stats = pyqtSignal(int, int)
+    top_results = pyqtSignal(list)
+    previews = pyqtSignal(list)
+    discarded = pyqtSignal(list)
+    metrics_updated = pyqtSignal(dict)
+    error = pyqtSignal(str)
     
-    def __init__(self, genres, creds):
+    def __init__(self, genres, auth_managers, **options):
         super().__init__()
-        self.genres = genres
-        self.creds = creds
-        self._is_running = True
+        # Ready to use, tokens included (see CredentialsService)
+        self.auth_managers = auth_managers
+        options.setdefault('columns', [key for _, key in COLUMNS])
+        self.engine = ScanEngine(genres, on_total=self.total_playlists.emit, on_results=self.emit_results,
+                                 on_cache_stats=self.cache_stats.emit, on_top=self.top_results.emit,
+                                 on_preview=self.previews.emit, on_discard=self.discarded.emit,
+                                 on_metrics=self.metrics_updated.emit, **options)
     
     def run(self):
-        creds = json.loads(cipher_suite.decrypt(self.creds.encode()).decode())
-        
-        # Authenticate with Spotify
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=creds['client_id'],
-                                                       client_secret=creds['client_secret'],
-                                                       redirect_uri=creds['redirect_uri'],
-                                                       scope="playlist-read-private"))
-        
-        total_playlists_count = 0
-        for genre in self.genres:
-            # Get the total number of playlists for the genre
-            search_result = sp.search(q=f'genre:{genre}', type='playlist', limit=1)
-            total_playlists_count += search_result['playlists']['total']
-        self.total_playlists.emit(total_playlists_count)
-        
-        for genre in self.genres:
-            offset = 0
-            while self._is_running:
-                playlists = sp.search(q=f'genre:{genre}', type='playlist', limit=50, offset=offset)
-                if not playlists['playlists']['items']:
-                    break
-                for playlist in playlists['playlists']['items']:
-                    playlist_id = playlist['id']
-                    detailed_playlist = sp.playlist(playlist_id)
-                    owner_profile = sp.user(detailed_playlist['owner']['id'])
-                    result = {
-                        'name': detailed_playlist['name'],
-                        'likes': detailed_playlist['followers']['total'],
-                        'owner': detailed_playlist['owner']['display_name'],
-                        'link': detailed_playlist['external_urls']['spotify'],
-                        'owner_email': owner_profile.get('email', 'N/A'),
-                        'additional_info': detailed_playlist.get('description', 'N/A')
-                    }
-                    self.new_result.emit(result)
-                    time.sleep(0.1)  # Simulate processing time
-                    self.progress.emit(1)
-                offset += 50
-        self.finished.emit()
+        # An exception leaving QThread.run would abort the whole app, so it
+        # is reported instead; finished follows either way, so the buttons
+        # come back
+        try:
+            self.engine.run(self.auth_managers)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+    
+    def emit_results(self, results):
+        self.new_results.emit(results)
+        self.progress.emit(len(results))
     
     def stop(self):
-        self._is_running = False
+        self.engine.stop()
 
 class AboutDialog(QDialog):
     def __init__(self):
@@ -105,6 +102,19 @@ class AboutDialog(QDialog):
 class App(QMainWindow):
     def __init__(self):
         super().__init__()
+        # Read and decrypted on the first search, then reused by every search
+        self.credentials = CredentialsService('credentials.json')
+        # Owner profiles are kept for the whole session and between runs
+        self.owner_cache = TTLCache(path='owner_cache.json')
+        # Search pages and playlists are revalidated with ETags on re-scans;
+        # opened on the first search (it pulls in requests)
+        self.response_cache = None
+        # Results are also streamed here during a search when set
+        self.export_path = None
+        # Lets a stopped (or interrupted) search pick up where it left off
+        self.checkpoint = ScanCheckpoint('scan_state.json')
+        # Unchanged playlists (same snapshot_id) are not re-enriched on re-scans
+        self.playlist_store = PlaylistStore('playlists.sqlite')
         self.initUI()
     
     def initUI(self):
@@ -132,6 +142,44 @@ class App(QMainWindow):
                                    "EDM", "Electro", "Synthwave", "Trap", "Future Bass"])
         layout.addWidget(self.genre_combo)
         
+        self.workers_label = QLabel('Concurrent Requests:', self)
+        layout.addWidget(self.workers_label)
+        
+        self.workers_spin = QSpinBox(self)
+        self.workers_spin.setRange(1, 32)
+        self.workers_spin.setValue(8)
+        layout.addWidget(self.workers_spin)
+        
+        self.backend_label = QLabel('Request Backend:', self)
+        layout.addWidget(self.backend_label)
+        
+        self.backend_combo = QComboBox(self)
+        self.backend_combo.addItems(["threads", "asyncio"])
+        layout.addWidget(self.backend_combo)
+        
+        self.rank_label = QLabel('Rank Best Playlists By:', self)
+        layout.addWidget(self.rank_label)
+        
+        self.rank_combo = QComboBox(self)
+        self.rank_combo.addItem("Likes", 'likes')
+        self.rank_combo.addItem("Likes per Track", 'likes_per_track')
+        layout.addWidget(self.rank_combo)
+        
+        # 0 means no limit
+        self.limits_layout = QHBoxLayout()
+        
+        self.min_likes_spin = self.limitSpin('Min Likes:', 10000000)
+        self.max_results_spin = self.limitSpin('Max Results:', 100000)
+        self.max_pages_spin = self.limitSpin('Max Pages per Genre:', 21)
+        
+        layout.addLayout(self.limits_layout)
+        
+        self.lazy_check = QCheckBox('Show search results immediately, fill in likes and owners later', self)
+        layout.addWidget(self.lazy_check)
+        
+        self.app_auth_check = QCheckBox('Search without signing in (public playlists only)', self)
+        layout.addWidget(self.app_auth_check)
+        
         self.button_layout = QHBoxLayout()
         
         self.search_button = QPushButton('Search', self)
@@ -151,19 +199,51 @@ class App(QMainWindow):
         self.progressBar = QProgressBar(self)
         layout.addWidget(self.progressBar)
         
-        self.resultTable = QTableWidget(self)
-        self.resultTable.setColumnCount(6)
-        self.resultTable.setHorizontalHeaderLabels(["Name", "Likes", "Owner", "Link", "Owner Email", "Additional Info"])
+        self.resultModel = ResultTableModel(COLUMNS, parent=self)
+        self.resultTable = QTableView(self)
+        self.resultTable.setModel(self.resultModel)
         self.resultTable.setSortingEnabled(True)
         layout.addWidget(self.resultTable)
         
+        # Rows scrolled into view are enriched first in lazy mode
+        self.visible_timer = QTimer(self)
+        self.visible_timer.setSingleShot(True)
+        self.visible_timer.setInterval(100)
+        self.visible_timer.timeout.connect(self.prioritizeVisibleRows)
+        # Through a lambda: connected directly, valueChanged would pick the
+        # start(msec) overload and set the interval to the scroll position
+        self.resultTable.verticalScrollBar().valueChanged.connect(lambda: self.visible_timer.start())
+        self.resultModel.layoutChanged.connect(lambda: self.visible_timer.start())
+        
         self.info_label = QLabel(self)
         layout.addWidget(self.info_label)
         
+        self.cache_label = QLabel(self)
+        layout.addWidget(self.cache_label)
+        
+        self.top_label = QLabel(self)
+        layout.addWidget(self.top_label)
+        
+        self.metrics_box = QGroupBox('Metrics', self)
+        metrics_layout = QVBoxLayout()
+        self.metrics_label = QLabel(self)
+        self.metrics_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        metrics_layout.addWidget(self.metrics_label)
+        self.metrics_box.setLayout(metrics_layout)
+        layout.addWidget(self.metrics_box)
+        
         self.central_widget.setLayout(layout)
         
         self.createMenu()
     
+    def limitSpin(self, label, maximum):
+        self.limits_layout.addWidget(QLabel(label, self))
+        spin = QSpinBox(self)
+        spin.setRange(0, maximum)
+        spin.setSpecialValueText('No limit')
+        self.limits_layout.addWidget(spin)
+        return spin
+    
     def createMenu(self):
         menubar = self.menuBar()
         
@@ -173,6 +253,14 @@ class App(QMainWindow):
         viewCredentials.triggered.connect(self.viewSavedCredentials)
         fileMenu.addAction(viewCredentials)
         
+        exportResults = QAction('Export Results To...', self)
+        exportResults.triggered.connect(self.chooseExportFile)
+        fileMenu.addAction(exportResults)
+        
+        saveMetrics = QAction('Save Metrics...', self)
+        saveMetrics.triggered.connect(self.saveMetrics)
+        fileMenu.addAction(saveMetrics)
+        
         aboutMenu = menubar.addMenu('About')
         
         aboutAction = QAction('About', self)
@@ -181,11 +269,31 @@ class App(QMainWindow):
     
     def viewSavedCredentials(self):
         try:
-            with open('credentials.json', 'r') as file:
-                creds = json.load(file)
-                QMessageBox.information(self, 'Saved Credentials', json.dumps(creds, indent=4))
+            creds = self.credentials.credentials()
+            QMessageBox.information(self, 'Saved Credentials', json.dumps(creds, indent=4))
         except FileNotFoundError:
             QMessageBox.warning(self, 'Error', 'No saved credentials found.')
+        except ValueError:
+            QMessageBox.warning(self, 'Error', 'Cannot read the saved credentials.')
+    
+    def chooseExportFile(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Results To', 'results.csv',
+                                              'CSV (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet)')
+        if path:
+            self.export_path = path
+            self.info_label.setText(f"Next search will be exported to {path}")
+    
+    def saveMetrics(self):
+        if not hasattr(self, 'worker'):
+            QMessageBox.warning(self, 'Error', 'No search has been run yet.')
+            return
+        path, _ = QFileDialog.getSaveFileName(self, 'Save Metrics', 'metrics.prom', 'Prometheus text (*.prom *.txt)')
+        if path:
+            try:
+                with open(path, 'w') as file:
+                    file.write(self.worker.engine.metrics.prometheus())
+            except OSError as e:
+                QMessageBox.warning(self, 'Error', f'Cannot save metrics: {e}')
     
     def showAboutDialog(self):
         about_dialog = AboutDialog()
@@ -193,60 +301,158 @@ class App(QMainWindow):
     
     def startSearch(self):
         self.search_button.setEnabled(False)
-        self.resultTable.setRowCount(0)
         
         try:
-            with open('credentials.json', 'r') as file:
-                creds = json.load(file)
+            auth_managers = self.credentials.auth_managers(user_auth=not self.app_auth_check.isChecked())
         except FileNotFoundError:
             QMessageBox.warning(self, 'Error', 'No credentials file found.')
             self.search_button.setEnabled(True)
             return
+        except (ValueError, KeyError):
+            QMessageBox.warning(self, 'Error', 'Cannot read the credentials file.')
+            self.search_button.setEnabled(True)
+            return
         
-        encoded_creds = cipher_suite.encrypt(json.dumps(creds).encode()).decode()
+        if self.response_cache is None:
+            from http_cache import ResponseCache
+            self.response_cache = ResponseCache('http_cache.sqlite')
         
         genre = self.genre_combo.currentText()
         
-        self.worker = Worker([genre], encoded_creds)
+        resume = False
+        if self.checkpoint.can_resume([genre]):
+            answer = QMessageBox.question(self, 'Resume Search',
+                                          f"A previous {genre} search was stopped after "
+                                          f"{len(self.checkpoint.processed)} playlists. Resume it?")
+            resume = answer == QMessageBox.Yes
+        self.checkpoint.start([genre], resume=resume)
+        if not resume:
+            self.resultModel.clear()
+        
+        sinks = []
+        if self.export_path:
+            try:
+                sinks.append(open_sink(self.export_path, [key for _, key in COLUMNS], append=resume))
+            except (OSError, RuntimeError) as e:
+                QMessageBox.warning(self, 'Error', f'Cannot export results: {e}')
+                self.search_button.setEnabled(True)
+                return
+        
+        self.worker = Worker([genre], auth_managers, max_workers=self.workers_spin.value(),
+                             owner_cache=self.owner_cache, backend=self.backend_combo.currentText(),
+                             response_cache=self.response_cache, sinks=sinks, checkpoint=self.checkpoint,
+                             playlist_store=self.playlist_store,
+                             ranker=TopK(k=TOP_PLAYLISTS, key=self.rank_combo.currentData()),
+                             min_likes=self.min_likes_spin.value() or None,
+                             max_results=self.max_results_spin.value() or None,
+                             max_pages=self.max_pages_spin.value() or None,
+                             lazy=self.lazy_check.isChecked())
         self.worker.total_playlists.connect(self.displayTotalPlaylists)
         self.worker.progress.connect(self.updateProgress)
-        self.worker.new_result.connect(self.addResult)
+        self.worker.new_results.connect(self.addResults)
+        self.worker.previews.connect(self.addPreviews)
+        self.worker.discarded.connect(self.resultModel.removeResults)
+        self.worker.cache_stats.connect(self.displayCacheStats)
+        self.worker.metrics_updated.connect(self.displayMetrics)
+        self.worker.top_results.connect(self.displayTopResults)
         self.worker.finished.connect(self.searchFinished)
+        self.worker.error.connect(self.searchFailed)
         
         self.worker.start()
     
     def stopSearch(self):
+        # Doesn't wait for the worker: the scan winds down on its own and
+        # searchFinished runs once the results it already has are shown
         if self.worker.isRunning():
             self.worker.stop()
-            self.worker.wait()
+            self.stop_button.setEnabled(False)
+            self.info_label.setText("Stopping...")
     
     @pyqtSlot(int)
     def displayTotalPlaylists(self, total):
         self.info_label.setText(f"Total Playlists: {total}")
         self.progressBar.setMaximum(total)
-        estimated_time = total * 0.1  # Assuming each playlist takes 0.1 seconds
-        self.info_label.setText(f"Total Playlists: {total} - Estimated Time: {estimated_time:.2f} seconds")
+    
+    @pyqtSlot(dict)
+    def displayMetrics(self, metrics):
+        # The ETA comes from the rate measured over the last few seconds
+        if metrics['eta'] is not None and self.worker.isRunning():
+            self.info_label.setText(f"Total Playlists: {metrics['total']} - "
+                                    f"Estimated Time Left: {metrics['eta']:.0f} seconds")
+        rate = f"{metrics['rate']:.1f}/s" if metrics['rate'] is not None else '-'
+        lines = [f"Elapsed {metrics['elapsed']:.0f}s, {rate} playlists"]
+        for stage, stats in metrics['stages'].items():
+            lines.append(f"{stage:<9}{stats['count']:>7} calls  p50 {stats['p50'] * 1000:7.1f} ms  "
+                         f"p99 {stats['p99'] * 1000:7.1f} ms")
+        lines.append(', '.join(f"{name.replace('_', ' ')} {value}" for name, value in metrics['counters'].items()))
+        self.metrics_label.setText('\n'.join(lines))
+    
+    @pyqtSlot(int, int)
+    def displayCacheStats(self, hits, misses):
+        self.cache_label.setText(f"Owner cache: {hits} hits / {misses} misses")
+    
+    @pyqtSlot(list)
+    def displayTopResults(self, results):
+        ranker = self.worker.engine.ranker
+        lines = [f"{rank}. {result['name']} ({ranker.score(result):g})" for rank, result in enumerate(results, 1)]
+        self.top_label.setText(f"Best playlists by {ranker.key.replace('_', ' ')}:\n" + '\n'.join(lines))
     
     def updateProgress(self, value):
         self.progressBar.setValue(self.progressBar.value() + value)
     
-    def addResult(self, result):
-        row_position = self.resultTable.rowCount()
-        self.resultTable.insertRow(row_position)
-        
-        self.resultTable.setItem(row_position, 0, QTableWidgetItem(result['name']))
-        self.resultTable.setItem(row_position, 1, QTableWidgetItem(str(result['likes'])))
-        self.resultTable.setItem(row_position, 2, QTableWidgetItem(result['owner']))
-        self.resultTable.setItem(row_position, 3, QTableWidgetItem(result['link']))
-        self.resultTable.setItem(row_position, 4, QTableWidgetItem(result['owner_email']))
-        self.resultTable.setItem(row_position, 5, QTableWidgetItem(result['additional_info']))
+    def addResults(self, results):
+        # The model re-sorts once per batch; rows previewed in lazy mode are
+        # filled in place
+        self.resultModel.updateResults(results)
+    
+    def addPreviews(self, results):
+        self.resultModel.updateResults(results)
+        self.visible_timer.start()
+    
+    def prioritizeVisibleRows(self):
+        if not hasattr(self, 'worker') or not self.worker.isRunning():
+            return
+        first = self.resultTable.rowAt(0)
+        if first < 0:
+            return
+        last = self.resultTable.rowAt(self.resultTable.viewport().height() - 1)
+        if last < 0:
+            last = self.resultModel.rowCount() - 1
+        self.worker.engine.prioritize([self.resultModel.resultId(row) for row in range(first, last + 1)])
     
     def searchFinished(self):
         self.search_button.setEnabled(True)
-        self.info_label.setText("Search finished.")
+        self.stop_button.setEnabled(True)
+        self.info_label.setText(f"Search finished. {self.worker.engine.unchanged()} unchanged playlists "
+                                f"reused from previous scans, {self.worker.engine.below_min_likes} "
+                                f"below the minimum likes skipped.")
+    
+    def searchFailed(self, message):
+        QMessageBox.warning(self, 'Error', f'The search failed: {message}')
+    
+    def closeEvent(self, event):
+        # Requests abandoned by the stop time out on their own; the scan
+        # thread itself is done within a moment
+        if hasattr(self, 'worker') and self.worker.isRunning():
+            self.worker.stop()
+            self.worker.wait(2000)
+        self.credentials.close()
+        super().closeEvent(event)
+
+def reportStartupTime(app):
+    # Time until the window's first paint, and which heavy modules were
+    # imported by then (ideally none: they load on the first search)
+    elapsed = time.perf_counter() - STARTED
+    heavy = [name for name in ('spotipy', 'requests', 'aiohttp', 'cryptography', 'pandas') if name in sys.modules]
+    print(f"Window shown after {elapsed * 1000:.0f} ms; heavy modules loaded: {', '.join(heavy) or 'none'}",
+          file=sys.stderr)
+    app.quit()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     ex = App()
     ex.show()
+    if '--startup-time' in sys.argv:
+        # Runs once the event loop has painted the window
+        QTimer.singleShot(0, lambda: reportStartupTime(app))
     sys.exit(app.exec_())
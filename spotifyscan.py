@@ -0,0 +1,108 @@
+import argparse
+import sys
+from cache import TTLCache
+from http_cache import ResponseCache
+from scan_engine import ScanEngine, RESULT_KEYS
+from export_sinks import open_sink, SINKS
+from checkpoint import ScanCheckpoint
+from playlist_store import PlaylistStore
+from topk import TopK
+from credentials import CredentialsService
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Scan Spotify playlists by genre without the GUI.')
+    parser.add_argument('genres', nargs='+', help='genres to search, e.g. "drum and bass" idm')
+    parser.add_argument('-o', '--output', default='-', help='file to write results to (default: stdout)')
+    parser.add_argument('--format', choices=sorted(SINKS), default=None,
+                        help='output format (default: from the output extension, jsonl for stdout)')
+    parser.add_argument('--credentials', default='credentials.json', help='JSON file with client_id, client_secret and redirect_uri, or a list of '
+                             'them to spread the scan over several Spotify apps')
+    parser.add_argument('--app-auth', action='store_true',
+                        help='authenticate as the app only (client credentials): no browser sign-in, '
+                             'public playlists and profiles only')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent playlist/owner lookups')
+    parser.add_argument('--page-workers', type=int, default=4, help='concurrent search page requests')
+    parser.add_argument('--backend', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many results')
+    parser.add_argument('--min-likes', type=int, default=None,
+                        help='skip playlists with fewer followers (checked before the owner lookup)')
+    parser.add_argument('--max-pages', type=int, default=None, help='search pages to scan per genre (50 playlists each)')
+    parser.add_argument('--columns', default=','.join(RESULT_KEYS), help='comma-separated result fields to output')
+    parser.add_argument('--owner-cache', default='owner_cache.json', help='owner profile cache file ("" to disable)')
+    parser.add_argument('--state', default='scan_state.json', help='checkpoint file for resuming a stopped scan')
+    parser.add_argument('--resume', action='store_true', help='continue the scan recorded in --state')
+    parser.add_argument('--store', default='playlists.sqlite',
+                        help='playlist store for incremental re-scans ("" to disable)')
+    parser.add_argument('--no-refresh-likes', action='store_true',
+                        help='reuse stored follower counts of unchanged playlists instead of re-fetching them')
+    parser.add_argument('--top', type=int, default=0, help='print the N best playlists to stderr when done')
+    parser.add_argument('--rank-by', choices=['likes', 'likes_per_track'], default='likes',
+                        help='what --top ranks playlists by')
+    parser.add_argument('--metrics', default=None, help='write scan metrics in Prometheus text format to this file')
+    parser.add_argument('--response-cache', default='http_cache.sqlite', help='HTTP response cache file ("" to disable)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Plain or encrypted (python credentials.py) credentials file
+    try:
+        credentials = CredentialsService(args.credentials)
+        # Tokens are renewed in the background for as long as the scan runs
+        managers = credentials.auth_managers(user_auth=not args.app_auth)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Cannot read {args.credentials}: {e}")
+
+    columns = args.columns.split(',')
+    unknown = set(columns) - set(RESULT_KEYS)
+    if unknown:
+        sys.exit(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    checkpoint = ScanCheckpoint(args.state)
+    resume = args.resume and checkpoint.can_resume(args.genres)
+    checkpoint.start(args.genres, resume=resume)
+
+    # The best playlists are ranked as results stream in, not sorted at the end
+    ranker = TopK(k=args.top, key=args.rank_by) if args.top > 0 else None
+
+    # Results are streamed to the sink batch by batch as the scan runs
+    sink = open_sink(args.output, columns, args.format, append=resume)
+
+    engine = ScanEngine(args.genres,
+                        max_workers=args.workers,
+                        page_workers=args.page_workers,
+                        backend=args.backend,
+                        owner_cache=TTLCache(path=args.owner_cache or None),
+                        response_cache=ResponseCache(args.response_cache) if args.response_cache else None,
+                        columns=columns,
+                        max_results=args.limit,
+                        min_likes=args.min_likes,
+                        max_pages=args.max_pages,
+                        sinks=[sink],
+                        checkpoint=checkpoint,
+                        playlist_store=PlaylistStore(args.store) if args.store else None,
+                        refresh_likes=not args.no_refresh_likes,
+                        ranker=ranker,
+                        on_total=lambda total: print(f"Total playlists: {total}", file=sys.stderr))
+    try:
+        engine.run(managers)
+    except KeyboardInterrupt:
+        engine.stop()
+    print(f"Duplicate playlists skipped: {engine.seen.duplicates}", file=sys.stderr)
+    if args.min_likes is not None:
+        print(f"Playlists below {args.min_likes} likes skipped: {engine.below_min_likes}", file=sys.stderr)
+    if engine.unavailable:
+        print(f"Unavailable (deleted or private) playlists skipped: {engine.unavailable}", file=sys.stderr)
+    if args.metrics:
+        with open(args.metrics, 'w') as file:
+            file.write(engine.metrics.prometheus())
+    if ranker is not None:
+        print(f"Top {len(ranker)} by {args.rank_by}:", file=sys.stderr)
+        for rank, result in enumerate(ranker.top(), 1):
+            genres = ', '.join(engine.matched_genres(result['id']))
+            print(f"{rank:>3}. {result.get('name')} ({ranker.score(result):g}) [{genres}]", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
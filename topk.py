@@ -0,0 +1,45 @@
+import heapq
+from itertools import count
+
+
+class TopK:
+    # Keeps the k best results seen so far in a min-heap, so ranking a scan
+    # costs O(n log k) time and O(k) memory instead of sorting everything.
+    # key is a numeric result field ('likes', 'followers') or that field
+    # divided by the track count ('likes_per_track').
+    def __init__(self, k=10, key='likes'):
+        self.k = k
+        self.key = key
+        if key.endswith('_per_track'):
+            self.field = key[:-len('_per_track')]
+            self.requires = [self.field, 'tracks']
+        else:
+            self.field = key
+            self.requires = [key]
+        self._heap = []
+        self._seq = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def score(self, result):
+        value = result.get(self.field) or 0
+        if self.field != self.key:
+            return value / max(result.get('tracks') or 0, 1)
+        return value
+
+    def add(self, result):
+        # The sequence number keeps ties in arrival order and stops heapq
+        # from ever comparing two result dicts
+        item = (self.score(result), -next(self._seq), result)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def update(self, results):
+        for result in results:
+            self.add(result)
+
+    def top(self):
+        return [result for _, _, result in sorted(self._heap, reverse=True)]